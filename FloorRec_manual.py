@@ -2,10 +2,10 @@ import numpy as np
 import cv2 as cv
 import random
 import matplotlib.pyplot as plt
-from sklearn.cluster import DBSCAN
 import yaml
 import os
 import glob
+from clustering import gap_clusters, gap_eps
 
 # Load configuration from YAML
 def load_config(config_file="user.yaml"):
@@ -94,13 +94,12 @@ for xt, yt, xb, yb in data_net:
 average_column_height = np.mean(column_heights)
 print(f"Average height of all columns: {average_column_height:.2f} pixels")
 
-# Apply DBSCAN clustering based on x-coordinates
-x_coords = np.array([x for x, _ in bottom_points]).reshape(-1, 1)
-eps_value = np.average(np.diff(np.sort(x_coords[:, 0]))) * 1.2
+# Cluster the columns into vertical lines by their bottom x-coordinate
+x_coords = np.array([x for x, _ in bottom_points])
+eps_value = gap_eps(x_coords)
 print('Calculated eps:', eps_value)
 
-dbscan = DBSCAN(eps=eps_value, min_samples=1)
-clusters = dbscan.fit_predict(x_coords)
+clusters = gap_clusters(x_coords, eps_value)
 
 # Initialize a dictionary to store the clusters
 cluster_dict = {}
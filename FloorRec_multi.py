@@ -1,11 +1,15 @@
 import numpy as np
-import cv2 as cv
-import random
-import matplotlib.pyplot as plt
-from sklearn.cluster import DBSCAN
+import logging
 import yaml
 import os
 import glob
+import json
+from itertools import repeat
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from image_meta import image_size
+from artifacts import writer_from_config, field_array
+from detection_table import table_from_config
+from clustering import gap_clusters, gap_eps
 
 # Load configuration from YAML
 def load_config(config_file="user.yaml"):
@@ -16,11 +20,38 @@ def load_config(config_file="user.yaml"):
 def get_full_path(major_folder, relative_path):
     return os.path.join(major_folder, relative_path)
 
-def process_image(image_file_path, view, asbuilt_output_folder):
+logger = logging.getLogger(__name__)
+
+# Threshold on a cluster's scaled distance for starting at floor 1 instead of floor 2
+DISTANCE_THRESHOLD = 0.31
+# Gap between stacked columns, in average column heights, above which floors were skipped
+FLOOR_TOLERANCE = 1.93
+
+# Defaults for the optional `floor_recognition` section of user.yaml
+FLOOR_DEFAULTS = {'distance_threshold': DISTANCE_THRESHOLD, 'tolerance': FLOOR_TOLERANCE,
+                  'workers': 1, 'executor': 'process', 'chunksize': 8}
+EXECUTORS = ('process', 'thread')
+
+def floor_settings(config):
+    settings = dict(FLOOR_DEFAULTS, **(config.get('floor_recognition') or {}))
+    if settings['executor'] not in EXECUTORS:
+        raise ValueError(f"Unknown floor_recognition executor: {settings['executor']}. Use one of: {', '.join(EXECUTORS)}.")
+    return settings
+
+def recognize_image(image_file_path, view, asbuilt_output_folder, artifacts=None, detections=None,
+                    distance_threshold=DISTANCE_THRESHOLD, tolerance=FLOOR_TOLERANCE):
+    """Cluster one image's columns, assign their floors and save the cluster plot.
+
+    Returns {'image', 'name', 'status', 'error', 'rows'}: status is 'ok' with the (M, 5)
+    xt, yt, xb, yb, floor rows, or 'skipped' / 'failed' with the reason in error.
+    """
+    from matplotlib.figure import Figure
+
     print(f"\nProcessing image: {image_file_path}")
     
     # Get the image file name without the extension
     file_name = os.path.splitext(os.path.basename(image_file_path))[0]
+    result = {'image': image_file_path, 'name': file_name, 'status': 'skipped', 'error': None, 'rows': None}
 
     # Find the corresponding text file based on the image name and view direction
     if view == "east":
@@ -34,173 +65,210 @@ def process_image(image_file_path, view, asbuilt_output_folder):
     else:
         raise ValueError(f"Unknown view direction: {view}")
 
-    if not os.path.exists(net_output_file):
-        print(f"Warning: Text file not found for image {file_name}. Skipping.")
-        return
+    # Detections from the artifact store or the detection table when available, else from the text file
+    data_net = None
+    if artifacts is not None:
+        records = artifacts.get('detections', image=file_name, view=view)
+        if records is not None:
+            data_net = field_array(records, ('xt', 'yt', 'xb', 'yb'))
+    if data_net is None and detections is not None:
+        data_net = detections.get(file_name, view)
+    if data_net is None and not os.path.exists(net_output_file):
+        return dict(result, error=f"Text file not found for image {file_name}")
 
     try:
-        # Load the data from the text file
-        data_net = np.loadtxt(net_output_file, delimiter=',')
-
-        # Read the image
-        I = cv.imread(image_file_path)
-        if I is None:
-            print(f"Warning: Could not read image {file_name}. Skipping.")
-            return
-
-        m, n, _ = I.shape
-
-        bottom_points = []
-        column_data = []
-        column_heights = []
-
-        # Process column data
-        for xt, yt, xb, yb in data_net:
-            height = yt - yb
-            xb_transformed = int(xb)
-            yb_transformed = int(m - yb)
-            xt_transformed = int(xt)
-            yt_transformed = int(m - yt)
-            
-            xb, yb, xt, yt = map(int, [xb, yb, xt, yt])
-
-            bottom_points.append((xb, yb))
-            column_data.append([xt, yt, xb, yb])
-            column_heights.append(height)
-            
-            cv.circle(I, (xb_transformed, yb_transformed), 4, (255, 0, 0), 2)
+        if data_net is None:
+            # Load the data from the text file
+            data_net = np.loadtxt(net_output_file, delimiter=',')
+
+        # Skip images that are missing or unreadable; only the file header is parsed
+        try:
+            image_size(image_file_path)
+        except (OSError, ValueError):
+            return dict(result, error=f"Could not read image {file_name}")
+
+        # Pixel coordinates are truncated to int like the detection text files; heights are not
+        data_net = np.asarray(data_net, dtype=np.float64).reshape(-1, 4)
+        if len(data_net) == 0:
+            return dict(result, error=f"No columns detected in image {file_name}")
+        column_data = data_net.astype(np.int64)   # xt, yt, xb, yb
+        column_heights = data_net[:, 1] - data_net[:, 3]
 
         # Calculate average height
         average_column_height = np.mean(column_heights)
         print(f"Average height of columns: {average_column_height:.2f} pixels")
 
-        # DBSCAN clustering
-        x_coords = np.array([x for x, _ in bottom_points]).reshape(-1, 1)
-        eps_value = np.average(np.diff(np.sort(x_coords[:, 0]))) * 1.2
+        # Cluster the columns into vertical lines by their bottom x-coordinate
+        x_coords = column_data[:, 2]
+        eps_value = gap_eps(x_coords)
         print(f'Calculated eps: {eps_value}')
-        
-        dbscan = DBSCAN(eps=eps_value, min_samples=1)
-        clusters = dbscan.fit_predict(x_coords)
-
-        # Create cluster dictionary
-        cluster_dict = {}
-        for i, cluster_id in enumerate(clusters):
-            if cluster_id != -1:
-                if cluster_id not in cluster_dict:
-                    cluster_dict[cluster_id] = []
-                cluster_dict[cluster_id].append(column_data[i])
-
-        # Calculate scaled distances
-        cluster_distances = []
-        lowest_y_coords = []
-
-        for cluster in cluster_dict.values():
-            lowest_y = min([col[3] for col in cluster])
-            lowest_y_coords.append(lowest_y)
-        
-        avg_lowest_y = np.mean(lowest_y_coords)
-
-        for cluster_id, columns in cluster_dict.items():
-            lowest_col = min(columns, key=lambda x: x[3])
-            lowest_y = lowest_col[3]
-            column_height = lowest_col[1] - lowest_col[3]
-            
-            scaled_distance = (lowest_y - avg_lowest_y) / column_height
-            cluster_distances.append({
-                'cluster_id': cluster_id,
-                'scaled_distance': scaled_distance,
-                'lowest_y': lowest_y
-            })
+
+        clusters = gap_clusters(x_coords, eps_value)
 
         # Assign floors and collect results
-        all_floors_info = []
-        for cluster_id, columns in cluster_dict.items():
-            cluster_info = next(cd for cd in cluster_distances if cd['cluster_id'] == cluster_id)
-            
-            column_floor_info = assign_floors_with_gaps(
-                columns, 
-                average_column_height,
-                cluster_info['scaled_distance']
-            )
-            
-            all_floors_info.extend(column_floor_info)
-            
-            # Detailed printing of cluster information
-            print(f"\nResults for Cluster {cluster_id}:")
-            print(f"Scaled Distance: {cluster_info['scaled_distance']:.3f}")
-            print(f"Starting Floor: {'1' if cluster_info['scaled_distance'] <= DISTANCE_THRESHOLD else '2'}")
-            print("\nColumns in this cluster:")
-            print("Xtop    Ytop    Xbot    Ybot    Floor")
-            print("-" * 45)
-            
-            # Sort by floor number for clearer output
-            sorted_floor_info = sorted(column_floor_info, key=lambda x: x[4])
-            for xt, yt, xb, yb, floor in sorted_floor_info:
-                print(f"{xt:<7.1f} {yt:<7.1f} {xb:<7.1f} {yb:<7.1f} {floor}")
-            print("\n")
-
-        # Save results
-        output_file_name = f"{view}_{file_name}_floor_info.txt"
-        output_file_path = os.path.join(asbuilt_output_folder, output_file_name)
-        with open(output_file_path, 'w') as f:
-            f.write("Xtop, Ytop, Xbot, Ybot, Floor\n")
-            for entry in all_floors_info:
-                f.write(f"{entry[0]}, {entry[1]}, {entry[2]}, {entry[3]}, {entry[4]}\n")
-
-        print(f"Results saved to {output_file_path}")
-
-        # Visualize clusters
-        plt.figure(figsize=(10, 6))
-        for cluster_id, coordinates in cluster_dict.items():
-            x_values = [x[2] for x in coordinates]
+        all_floors_info, row_clusters, cluster_ids, scaled_distances = assign_floors(
+            column_data, clusters, average_column_height, tolerance, distance_threshold)
+
+        print(f"{len(all_floors_info)} columns in {len(cluster_ids)} clusters, "
+              f"floors {all_floors_info[:, 4].min()} to {all_floors_info[:, 4].max()}")
+        if logger.isEnabledFor(logging.DEBUG):
+            for cluster_id, scaled_distance in zip(cluster_ids.tolist(), scaled_distances.tolist()):
+                rows = all_floors_info[row_clusters == cluster_id]
+                logger.debug(f"Cluster {cluster_id}: scaled distance {scaled_distance:.3f}, "
+                             f"starting floor {'1' if scaled_distance <= distance_threshold else '2'}")
+                for xt, yt, xb, yb, floor in rows[np.argsort(rows[:, 4], kind='stable')].tolist():
+                    logger.debug(f"{xt:<7.1f} {yt:<7.1f} {xb:<7.1f} {yb:<7.1f} {floor}")
+
+        # Visualize clusters (Figure objects instead of pyplot so images can be processed in threads)
+        fig = Figure(figsize=(10, 6))
+        ax = fig.subplots()
+        for cluster_id in cluster_ids.tolist():
+            x_values = all_floors_info[row_clusters == cluster_id, 2]
             y_values = [cluster_id] * len(x_values)
-            plt.scatter(x_values, y_values, label=f'Cluster {cluster_id}', s=100)
+            ax.scatter(x_values, y_values, label=f'Cluster {cluster_id}', s=100)
 
-        plt.xlabel('X Coordinate')
-        plt.ylabel('Cluster ID')
-        plt.title(f'X Coordinates of Columns by Cluster - {file_name}')
-        plt.legend()
-        plt.grid(True)
+        ax.set_xlabel('X Coordinate')
+        ax.set_ylabel('Cluster ID')
+        ax.set_title(f'X Coordinates of Columns by Cluster - {file_name}')
+        ax.legend()
+        ax.grid(True)
         
         # Save plot
         plot_path = os.path.join(asbuilt_output_folder, f"{view}_{file_name}_clusters.png")
-        plt.savefig(plot_path)
-        plt.close()
+        fig.savefig(plot_path)
+        return dict(result, status='ok', rows=all_floors_info)
 
     except Exception as e:
-        print(f"Error processing {file_name}: {str(e)}")
-
-def assign_floors_with_gaps(column_data, avg_height, scaled_distance, tolerance=1.93):
-    column_data.sort(key=lambda col: col[3], reverse=True)
-    column_floor_info = []
-
-    if scaled_distance <= DISTANCE_THRESHOLD:
-        floor_number = 1
+        return dict(result, status='failed', error=f"{type(e).__name__}: {e}")
+
+def save_floor_info(result, view, asbuilt_output_folder, artifacts=None):
+    """Write a recognized image's floor file and artifact rows, returns the file path"""
+    output_file_path = os.path.join(asbuilt_output_folder, f"{view}_{result['name']}_floor_info.txt")
+    with open(output_file_path, 'w') as f:
+        f.write("Xtop, Ytop, Xbot, Ybot, Floor\n")
+        f.write(''.join(f"{xt}, {yt}, {xb}, {yb}, {floor}\n" for xt, yt, xb, yb, floor in result['rows'].tolist()))
+
+    print(f"Results saved to {output_file_path}")
+    if artifacts is not None:
+        artifacts.add_rows('floors', result['rows'], image=result['name'], view=view)
+    return output_file_path
+
+def process_image(image_file_path, view, asbuilt_output_folder, artifacts=None, detections=None,
+                  distance_threshold=DISTANCE_THRESHOLD, tolerance=FLOOR_TOLERANCE):
+    """Recognize and save the floors of one image, returns the floor file or None"""
+    result = recognize_image(image_file_path, view, asbuilt_output_folder, artifacts, detections,
+                             distance_threshold, tolerance)
+    if result['status'] == 'skipped':
+        print(f"Warning: {result['error']}. Skipping.")
+        return None
+    if result['status'] == 'failed':
+        print(f"Error processing {result['name']}: {result['error']}")
+        return None
+    return save_floor_info(result, view, asbuilt_output_folder, artifacts)
+
+# Detection sources of a pool worker process, opened once per process by _init_worker
+_worker_sources = (None, None)
+
+def _init_worker(config):
+    global _worker_sources
+    _worker_sources = (writer_from_config(config), table_from_config(config))
+
+def _recognize_in_worker(image_file_path, view, asbuilt_output_folder, distance_threshold, tolerance):
+    artifacts, detections = _worker_sources
+    return recognize_image(image_file_path, view, asbuilt_output_folder, artifacts, detections,
+                           distance_threshold, tolerance)
+
+def process_images(image_files, view, asbuilt_output_folder, config, artifacts=None, detections=None, settings=None):
+    """Floor recognition over many images on a process or thread pool.
+
+    Results come back in the order of image_files; the floor files and artifact rows of all
+    images are then written in one pass. Returns one summary per image:
+    {'image', 'status', 'error', 'floor_file'}. Worker processes open their own artifact
+    store and detection table from config, so they read what the parent flushed to disk.
+    """
+    settings = settings or floor_settings(config)
+    thresholds = (settings['distance_threshold'], settings['tolerance'])
+    workers = settings['workers'] or os.cpu_count() or 1
+    chunksize = max(1, settings['chunksize'])
+
+    if workers == 1 or len(image_files) <= 1:
+        results = [recognize_image(path, view, asbuilt_output_folder, artifacts, detections, *thresholds)
+                   for path in image_files]
+    elif settings['executor'] == 'thread':
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(lambda path: recognize_image(path, view, asbuilt_output_folder, artifacts,
+                                                                 detections, *thresholds), image_files))
     else:
-        floor_number = 2
-
-    prev_y = column_data[-1][3]
-
-    for idx, col in enumerate(reversed(column_data)):
-        xt, yt, xb, yb = col
-        if idx == 0:
-            column_floor_info.append((xt, yt, xb, yb, floor_number))
-        else:
-            vertical_distance = yb - prev_y
-            
-            if vertical_distance > 2 * avg_height * tolerance:
-                floor_number += 3
-            elif vertical_distance > avg_height * tolerance:
-                floor_number += 2
-            else:
-                floor_number += 1
-            
-            column_floor_info.append((xt, yt, xb, yb, floor_number))
-        
-        prev_y = yb
-
-    column_floor_info.reverse()
-    return column_floor_info
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(config,)) as pool:
+            results = list(pool.map(_recognize_in_worker, image_files, repeat(view), repeat(asbuilt_output_folder),
+                                    repeat(thresholds[0]), repeat(thresholds[1]), chunksize=chunksize))
+
+    summary = []
+    for result in results:
+        floor_file = save_floor_info(result, view, asbuilt_output_folder, artifacts) if result['status'] == 'ok' else None
+        summary.append({'image': result['image'], 'status': result['status'], 'error': result['error'],
+                        'floor_file': floor_file})
+    return summary
+
+def print_summary(summary):
+    counts = {status: sum(entry['status'] == status for entry in summary) for status in ('ok', 'skipped', 'failed')}
+    print(f"\nFloor recognition: {counts['ok']} ok, {counts['skipped']} skipped, {counts['failed']} failed")
+    for entry in summary:
+        if entry['status'] != 'ok':
+            print(f"  {entry['status']:<8} {os.path.basename(entry['image'])}: {entry['error']}")
+
+def group_bounds(sorted_keys):
+    """Start index and length of each run of equal values in a sorted array"""
+    starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+    return starts, np.diff(np.r_[starts, len(sorted_keys)])
+
+def assign_floors(column_data, clusters, avg_height, tolerance=FLOOR_TOLERANCE, distance_threshold=DISTANCE_THRESHOLD):
+    """Assign a floor to every column of every cluster at once.
+
+    column_data is an (N, 4) int array of xt, yt, xb, yb and clusters the cluster label per
+    column (-1 is noise and dropped). Within a cluster, the column with the lowest bottom
+    starts at floor 1, or at floor 2 when the cluster's lowest point sits more than the distance
+    threshold (in column heights) above the average lowest point of all clusters. Each next
+    column up adds 1 floor, or 2 or 3 when the gap to the column below exceeds one or two
+    average column heights times the tolerance.
+
+    Returns the (M, 5) xt, yt, xb, yb, floor rows (clusters in order of first appearance, each
+    from the highest bottom down), each row's cluster label, and per cluster its label and
+    scaled distance.
+    """
+    column_data = np.asarray(column_data, dtype=np.int64)
+    clusters = np.asarray(clusters)
+    index = np.flatnonzero(clusters != -1)
+    unique_ids, first, inverse = np.unique(clusters[index], return_index=True, return_inverse=True)
+    appearance = np.argsort(first)
+    cluster_ids = unique_ids[appearance]                        # order of first appearance
+    rank = np.argsort(appearance)[inverse]
+    yb = column_data[index, 3]
+
+    # Each cluster's lowest column (first one in input order on ties) and the scaled distance
+    by_low = np.lexsort((index, yb, rank))
+    lowest_starts, _ = group_bounds(rank[by_low])
+    lowest = index[by_low[lowest_starts]]
+    lowest_y = column_data[lowest, 3]
+    column_height = column_data[lowest, 1] - lowest_y
+    scaled_distances = (lowest_y - np.mean(lowest_y)) / column_height
+    start_floor = np.where(scaled_distances <= distance_threshold, 1, 2)
+
+    # Walk up each cluster: ascending bottom, ties in reverse input order
+    up = np.lexsort((-index, yb, rank))
+    starts, counts = group_bounds(rank[up])
+    gaps = np.diff(yb[up], prepend=0)
+    steps = np.where(gaps > 2 * avg_height * tolerance, 3, np.where(gaps > avg_height * tolerance, 2, 1))
+    steps[starts] = start_floor
+    floors_up = np.cumsum(steps)
+    floors_up -= np.repeat(floors_up[starts] - start_floor, counts)
+
+    # Rows are written from the highest bottom down, ties in input order
+    down = np.lexsort((index, -yb, rank))
+    floors = np.empty(len(index), dtype=np.int64)
+    floors[up] = floors_up
+    rows = np.column_stack([column_data[index[down]], floors[down]])
+    return rows, clusters[index[down]], cluster_ids, scaled_distances
 
 def main():
     # Load configuration
@@ -210,18 +278,25 @@ def main():
     asbuilt_images_path = get_full_path(major_folder, config['paths']['asbuilt_images'])
     view = config['view_direction'].strip().lower()
 
-    # Define threshold for floor determination
-    global DISTANCE_THRESHOLD
-    DISTANCE_THRESHOLD = 0.31
+    # Thresholds for floor determination and the pool settings
+    settings = floor_settings(config)
 
     # Process all images in the directory
-    image_files = glob.glob(os.path.join(asbuilt_images_path, "*.jpg")) + \
-                 glob.glob(os.path.join(asbuilt_images_path, "*.png"))
+    image_files = sorted(glob.glob(os.path.join(asbuilt_images_path, "*.jpg")) + \
+                         glob.glob(os.path.join(asbuilt_images_path, "*.png")))
     
     print(f"Found {len(image_files)} images to process")
     
-    for image_file_path in image_files:
-        process_image(image_file_path, view, asbuilt_output_folder)
+    artifacts = writer_from_config(config)
+    detections = table_from_config(config)
+    summary = process_images(image_files, view, asbuilt_output_folder, config, artifacts, detections, settings)
+    if artifacts is not None:
+        artifacts.flush()
+
+    print_summary(summary)
+    summary_path = os.path.join(asbuilt_output_folder, f"{view}_floor_summary.json")
+    with open(summary_path, 'w') as f:
+        json.dump(summary, f, indent=2)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
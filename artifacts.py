@@ -0,0 +1,230 @@
+import os
+import threading
+import numpy as np
+
+# One structured table per artifact; image id (file stem) and view are the key columns.
+# Tables are stored sorted by key, and keys longer than their field (128 characters
+# for image names) are rejected rather than silently truncated.
+TABLES = {
+    'planned': np.dtype([('view', 'U16'), ('xt', 'f8'), ('yt', 'f8'), ('xb', 'f8'), ('yb', 'f8'), ('level', 'i8')]),
+    'detections': np.dtype([('image', 'U128'), ('view', 'U16'),
+                            ('xt', 'f8'), ('yt', 'f8'), ('xb', 'f8'), ('yb', 'f8')]),
+    'floors': np.dtype([('image', 'U128'), ('view', 'U16'),
+                        ('xt', 'f8'), ('yt', 'f8'), ('xb', 'f8'), ('yb', 'f8'), ('floor', 'i8')]),
+    'progress': np.dtype([('image', 'U128'), ('view', 'U16'), ('floor', 'i8'), ('planned', 'i8'),
+                          ('constructed', 'i8'), ('percentage', 'f8'), ('overall', 'f8')]),
+}
+KEY_FIELDS = ('image', 'view')
+KEY_SEPARATOR = '\x1f'
+
+
+def to_records(table, values, **keys):
+    """Structured rows of a table from an (N, k) array of its value fields and constant key columns"""
+    dtype = TABLES[table]
+    value_fields = [name for name in dtype.names if name not in keys]
+    values = np.asarray(values, dtype=np.float64).reshape(-1, len(value_fields))
+    records = np.zeros(len(values), dtype=dtype)
+    for name, value in keys.items():
+        if dtype[name].kind == 'U' and len(str(value)) > dtype[name].itemsize // 4:
+            raise ValueError(f"{name} {value!r} is longer than the {dtype[name].itemsize // 4} characters "
+                             f"the {table} table stores")
+        records[name] = value
+    for i, name in enumerate(value_fields):
+        records[name] = values[:, i]
+    return records
+
+
+def field_array(records, fields):
+    """(N, k) float array of the given fields, e.g. ('xt', 'yt', 'xb', 'yb')"""
+    out = np.empty((len(records), len(fields)), dtype=np.float64)
+    for i, name in enumerate(fields):
+        out[:, i] = records[name]
+    return out
+
+
+def key_mask(records, **keys):
+    mask = np.ones(len(records), dtype=bool)
+    for name, value in keys.items():
+        mask &= records[name] == value
+    return mask
+
+
+def row_keys(records, key_fields):
+    """One string per row joining its key columns"""
+    keys = records[key_fields[0]].astype(str)
+    for name in key_fields[1:]:
+        keys = np.char.add(np.char.add(keys, KEY_SEPARATOR), records[name].astype(str))
+    return keys
+
+
+class ArtifactStore:
+    """Folder of typed tables, one .npy structured array per artifact, memory-mapped on load"""
+
+    def __init__(self, folder):
+        self.folder = folder
+
+    def path(self, table):
+        return os.path.join(self.folder, f"{table}.npy")
+
+    def save(self, table, records):
+        """Replace a table atomically"""
+        records = np.asarray(records, dtype=TABLES[table])
+        os.makedirs(self.folder, exist_ok=True)
+        tmp_path = self.path(table) + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.save(f, records)
+        os.replace(tmp_path, self.path(table))
+        # A key index of the previous table would no longer match
+        if os.path.exists(self.keys_path(table)):
+            os.remove(self.keys_path(table))
+
+    def keys_path(self, table):
+        return os.path.join(self.folder, f"{table}.keys.npy")
+
+    def merge(self, table, records, key_fields, replaced):
+        """Replace the stored rows of the replaced keys by records and write the table back sorted by key.
+
+        Kept rows are read from the memory map and written once into the new file, new rows
+        are placed at their sorted positions among them. A key index, <table>.keys.npy, is
+        written next to the table with the first row and row count of every recorded key, so
+        a key recorded with no rows stays distinguishable from a key never recorded.
+        """
+        records = np.asarray(records, dtype=TABLES[table])
+        new_keys = row_keys(records, key_fields)
+        order = np.argsort(new_keys, kind='stable')
+        records, new_keys = records[order], new_keys[order]
+        existing = self.load(table)
+        if existing is None:
+            existing = np.zeros(0, dtype=TABLES[table])
+        existing_keys = row_keys(existing, key_fields)
+        recorded = self.load_keys(table, len(existing))
+        recorded = np.unique(existing_keys) if recorded is None else recorded['key']
+
+        kept = np.flatnonzero(~np.isin(existing_keys, replaced))
+        # Already in key order unless the table was written before tables were kept sorted
+        kept = kept[np.argsort(existing_keys[kept], kind='stable')]
+        new_positions = np.searchsorted(existing_keys[kept], new_keys, side='right') + np.arange(len(records))
+        is_new = np.zeros(len(kept) + len(records), dtype=bool)
+        is_new[new_positions] = True
+        out_keys = np.empty(len(is_new), dtype=np.result_type(new_keys.dtype, existing_keys.dtype))
+        out_keys[new_positions] = new_keys
+        out_keys[~is_new] = existing_keys[kept]
+
+        os.makedirs(self.folder, exist_ok=True)
+        tmp_path = self.path(table) + '.tmp'
+        out = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=TABLES[table], shape=(len(is_new),))
+        out[new_positions] = records
+        out[~is_new] = existing[kept]
+        out.flush()
+        # Release both memory maps before the file is replaced
+        del out, existing
+        os.replace(tmp_path, self.path(table))
+
+        recorded = np.union1d(recorded, np.asarray(replaced, dtype=str))
+        starts = np.searchsorted(out_keys, recorded, side='left')
+        counts = np.searchsorted(out_keys, recorded, side='right') - starts
+        index = np.zeros(len(recorded), dtype=[('key', recorded.dtype), ('start', 'i8'), ('count', 'i8')])
+        index['key'], index['start'], index['count'] = recorded, starts, counts
+        tmp_path = self.keys_path(table) + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.save(f, index)
+        os.replace(tmp_path, self.keys_path(table))
+
+    def load_keys(self, table, rows):
+        """Key index of a table with the given number of rows, or None when it is missing or
+        belongs to another version of the table (e.g. written before key indexes existed)"""
+        path = self.keys_path(table)
+        if not os.path.exists(path):
+            return None
+        index = np.load(path)
+        if index['count'].sum() != rows:
+            return None
+        return index
+
+    def load(self, table):
+        """Memory-mapped table, or None when it has not been written yet"""
+        path = self.path(table)
+        if not os.path.exists(path):
+            return None
+        return np.load(path, mmap_mode='r')
+
+    def select(self, table, **keys):
+        """Rows of a table matching all the given key values, e.g. select('floors', view='east')"""
+        records = self.load(table)
+        if records is None:
+            return np.zeros(0, dtype=TABLES[table])
+        return records[key_mask(records, **keys)]
+
+
+class ArtifactWriter:
+    """Collects rows from worker threads and writes each table once, at flush.
+
+    Rows of a key (image and view, or view for the planned table) replace the rows of
+    that key already in the store, so an incremental run keeps the images it skipped.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.lock = threading.Lock()
+        self.pending = {table: {} for table in TABLES}
+        self.indexes = {}
+
+    def add_rows(self, table, values, **keys):
+        """Add an (N, k) value array under one key; an empty array records an empty result,
+        which get() returns as zero rows rather than None, also after a flush"""
+        key_fields = tuple(name for name in KEY_FIELDS if name in TABLES[table].names)
+        with self.lock:
+            self.pending[table][tuple(keys[name] for name in key_fields)] = to_records(table, values, **keys)
+
+    def get(self, table, **keys):
+        """Rows of one key added in this run, else stored by an earlier stage or run, else None"""
+        key_fields = tuple(name for name in KEY_FIELDS if name in TABLES[table].names)
+        key = tuple(keys[name] for name in key_fields)
+        with self.lock:
+            if key in self.pending[table]:
+                return self.pending[table][key]
+            if table not in self.indexes:
+                self.indexes[table] = self._build_index(table, key_fields)
+            rows = self.indexes[table].get(KEY_SEPARATOR.join(key))
+        if rows is None:
+            return None
+        records, start, stop = rows
+        return records[start:stop]
+
+    def _build_index(self, table, key_fields):
+        # key -> (rows, start, stop) over the stored table, built once per writer. Tables are
+        # written sorted by key, so each key's rows are a slice of the memory map
+        records = self.store.load(table)
+        if records is None:
+            return {}
+        index = self.store.load_keys(table, len(records))
+        if index is not None:
+            return {key: (records, start, start + count) for key, start, count in
+                    zip(index['key'].tolist(), index['start'].tolist(), index['count'].tolist())}
+        keys = row_keys(records, key_fields)
+        if np.any(keys[1:] < keys[:-1]):
+            # Written before tables were kept sorted: sort a copy until the next flush
+            order = np.argsort(keys, kind='stable')
+            records, keys = np.array(records[order]), keys[order]
+        unique, starts, counts = np.unique(keys, return_index=True, return_counts=True)
+        return {key: (records, start, start + count) for key, start, count in zip(unique.tolist(), starts, counts)}
+
+    def flush(self):
+        with self.lock:
+            pending = {table: dict(rows) for table, rows in self.pending.items() if rows}
+            for rows in self.pending.values():
+                rows.clear()
+            self.indexes.clear()
+
+        for table, rows_by_key in pending.items():
+            key_fields = tuple(name for name in KEY_FIELDS if name in TABLES[table].names)
+            self.store.merge(table, np.concatenate(list(rows_by_key.values())), key_fields,
+                             [KEY_SEPARATOR.join(key) for key in rows_by_key])
+
+
+def writer_from_config(config):
+    """ArtifactWriter over the configured artifact folder, or None when the store is disabled"""
+    if not config.get('artifact_store', False):
+        return None
+    folder = os.path.join(config['major_folder'], config['paths'].get('artifact_folder', 'advanced/artifacts'))
+    return ArtifactWriter(ArtifactStore(folder))
@@ -1,10 +1,18 @@
-import subprocess
 import os
-import glob
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
 import yaml
-import matplotlib.pyplot as plt
-from matplotlib.patches import Rectangle
-from PIL import Image
+import numpy as np
+from artifacts import writer_from_config
+from detection_table import table_from_config, compact_from_config
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif')
+
+# Detector options; also part of the run manifest's detection inputs and the detection cache key
+DETECTION_SETTINGS = {'conf_thres': 0.5, 'device': 'cpu', 'img_size': 640}
 
 def load_config(config_file="user.yaml"):
     with open(config_file, 'r') as file:
@@ -14,130 +22,139 @@ def load_config(config_file="user.yaml"):
 def get_full_path(major_folder, relative_path):
     return os.path.join(major_folder, relative_path)
 
-# Load configuration
-config = load_config()
-major_folder = config['major_folder']
-paths = config['paths']
-
-# Construct full paths from the major folder and relative paths
-model_path = get_full_path(major_folder, paths['model'])
-asbuilt_images = get_full_path(major_folder, paths['asbuilt_images'])
-detect_save_folder = get_full_path(major_folder, paths['detect_save_folder'])   # where detection results are saved
-output_folder_base = get_full_path(major_folder, paths['output_folder_base'])
-
-# View direction
-view_direction = config['view_direction'].strip().lower()  # Read view direction from config
-output_folder = os.path.join(output_folder_base, f"{view_direction}_output")  # coordinates save path
-
-# Ensure the view direction is valid
-if view_direction not in ["east", "west", "north", "south"]:
-    print("Invalid view direction. Please enter one of: east, west, north, south.")
-    exit()
-
-# Path to detect.py in the YOLOv5 repository
-detect_script_path = os.path.join(os.getcwd(), "yolov5", "detect.py")
-
-# Check if detect.py exists
-if not os.path.exists(detect_script_path):
-    print(f"Error: {detect_script_path} does not exist.")
-    exit()
-
-# Use the weights for detection
-command_detect = f"python {detect_script_path} --source {asbuilt_images} --weights {model_path} --conf 0.5 --hide-labels --line-thickness 1 --save-txt --nosave --project {detect_save_folder} --name exp --device cpu"
-# Run the command
-subprocess.run(command_detect, shell=True)
-
-detect_exp_folders = glob.glob(os.path.join(detect_save_folder, 'exp*', 'labels'))  # path to predicted labels for the last model
-if detect_exp_folders:
-    latest_detect_exp_folder = max(detect_exp_folders, key=os.path.getctime)
-    print("Latest Detect Experiment Folder:", latest_detect_exp_folder)
-else:
-    print("No predicted label folders found.")
-    exit()
-
-# Function to plot detected labels on images and save them
-def plot_label(folder_path, predicted_labels_folder, output_folder, view_direction):
-    line_width = 0.5
-
-    for filename in os.listdir(folder_path):
-        if filename.endswith(('.jpg', '.jpeg', '.png', '.gif')):
-            image_path = os.path.join(folder_path, filename)
-            img = Image.open(image_path)
-            fig, ax = plt.subplots(1)
-            ax.imshow(img)
-
-            predicted_labels_file = os.path.join(predicted_labels_folder, f'{filename.split(".")[0]}.txt')
-            if os.path.exists(predicted_labels_file):
-                with open(predicted_labels_file, "r") as file:
-                    for line in file:
-                        data = line.split()
-                        label = int(data[0])
-                        x, y, w, h = map(float, data[1:5])
-
-                        x = (x - w / 2.0) * img.width
-                        y = (y - h / 2.0) * img.height
-                        w *= img.width
-                        h *= img.height
-
-                        rect = Rectangle((x, y), w, h, linewidth=line_width, edgecolor="r", facecolor="none", label="Predicted Label")
-                        ax.add_patch(rect)
-
-            ax.set_xticks([])
-            ax.set_yticks([])
-            ax.set_xticklabels([])
-            ax.set_yticklabels([])
-            ax.axis('off')
-
-            save_path = os.path.join(output_folder, f'{filename}')
-            plt.savefig(save_path, bbox_inches='tight', pad_inches=0.0, dpi=300)
-            plt.close(fig)
-
-print("detection_predicted_labels_folder is", latest_detect_exp_folder)
-
-# Ensure the output folder exists
-os.makedirs(output_folder, exist_ok=True)
-
-plot_label(asbuilt_images, latest_detect_exp_folder, output_folder, view_direction)
-
-# Read labels and convert to the format
-for image_file in os.listdir(asbuilt_images):
-    if image_file.lower().endswith(('.jpg', '.jpeg', '.png', '.gif')):
-        image_path = os.path.join(asbuilt_images, image_file)
-        img = Image.open(image_path)
-        width, height = img.size
-        print(f"Image: {image_file}, Width: {width}, Height: {height}")
-
-        predicted_labels_file = os.path.join(latest_detect_exp_folder, f'{image_file.split(".")[0]}.txt')
-        elements_coordinates = []
-
-        if os.path.exists(predicted_labels_file):
-            with open(predicted_labels_file, "r") as file:
-                for line in file:
-                    data = line.split()
-                    label = int(data[0])
-                    x, y, w, h = map(float, data[1:5])
-
-                    x = x * width
-                    y = y * height #height - y * height # Flip the y-coordinate to be based on bottom-left corner *************************
-                    w *= width
-                    h *= height
-                    print('label size:', x,y,w,h)
-                    xtop = x
-                    ytop = y - h / 2
-                    xbot = x
-                    ybot = y + h / 2
-                    #from left bot  x no change
-                    ytop = height - ytop
-                    ybot = height - ybot
-                    
-                    mid_top = (xtop, ytop)
-                    mid_bottom = (xbot, ybot)
-                    print("Midpoint of the top:", mid_top)
-                    print("Midpoint of the bottom:", mid_bottom)
-
-                    elements_coordinates.append([mid_top[0], mid_top[1], mid_bottom[0], mid_bottom[1]])
-
+def get_view_direction(config):
+    view_direction = config['view_direction'].strip().lower()  # Read view direction from config
+    if view_direction not in ["east", "west", "north", "south"]:
+        raise ValueError("Invalid view direction. Please enter one of: east, west, north, south.")
+    return view_direction
+
+def get_output_folder(config, view_direction):
+    output_folder_base = get_full_path(config['major_folder'], config['paths']['output_folder_base'])
+    return os.path.join(output_folder_base, f"{view_direction}_output")  # coordinates save path
+
+def list_images(asbuilt_images):
+    return [os.path.join(asbuilt_images, f) for f in sorted(os.listdir(asbuilt_images))
+            if f.lower().endswith(IMAGE_EXTENSIONS)]
+
+def detection_settings(config):
+    """DETECTION_SETTINGS plus the tiling options of the optional `detection` section"""
+    settings = dict(DETECTION_SETTINGS)
+    detection_config = config.get('detection') or {}
+    if detection_config.get('tile_size'):
+        settings['tile_size'] = int(detection_config['tile_size'])
+        settings['tile_overlap'] = float(detection_config.get('tile_overlap', 0.2))
+        settings['tile_full_image'] = bool(detection_config.get('tile_full_image', True))
+    return settings
+
+def create_detector(config):
+    """Load the YOLOv5 weights once for in-process detection. With the detection cache
+    enabled, the weights are only loaded once an image is not in the cache."""
+    from detector import ColumnDetector
+    from detection_cache import CachedDetector, cache_from_config
+
+    model_path = get_full_path(config['major_folder'], config['paths']['model'])
+    settings = detection_settings(config)
+    cache = cache_from_config(config)
+    if cache is None:
+        return ColumnDetector(model_path, **settings)
+    return CachedDetector(lambda: ColumnDetector(model_path, **settings), cache, model_path, settings)
+
+def detect(image_paths, detector):
+    """Detect columns in a list of images, returns {image path: (K, 5) normalized labels}"""
+    return detector.detect(image_paths)
+
+def labels_to_coordinates(labels, width, height):
+    """Convert normalized [cls, x, y, w, h] labels to the (K, 4) top and bottom midpoints of each column,
+    xtop, ytop, xbot, ybot in pixels with y measured up from the bottom edge"""
+    labels = np.asarray(labels, dtype=np.float64).reshape(-1, 5)
+    x = labels[:, 1] * width
+    y = labels[:, 2] * height
+    h = labels[:, 4] * height
+
+    coordinates = np.empty((len(labels), 4), dtype=np.float64)
+    coordinates[:, 0] = x
+    coordinates[:, 1] = height - (y - h / 2)
+    coordinates[:, 2] = x
+    coordinates[:, 3] = height - (y + h / 2)
+
+    if logger.isEnabledFor(logging.DEBUG):
+        boxes = np.column_stack([x, y, labels[:, 3] * width, h]).tolist()
+        for box, (xt, yt, xb, yb) in zip(boxes, coordinates.tolist()):
+            logger.debug(f"label size: {box}, top midpoint: {(xt, yt)}, bottom midpoint: {(xb, yb)}")
+    return coordinates
+
+def convert_image(image_path, labels, shape, img, output_folder, view=None, artifacts=None, detections=None,
+                  overlay=None):
+    """Save the overlay and the column coordinates of one detected image, returns the coordinates file.
+    With a DetectionTable the coordinates are appended to it instead of a per-image .txt, and
+    with an ArtifactWriter they are also added to its detections table."""
+    image_file = os.path.basename(image_path)
+    height, width = shape
+    print(f"Image: {image_file}, Width: {width}, Height: {height}")
+
+    if img is not None:
+        from overlay import OVERLAY_DEFAULTS, write_overlay
+        write_overlay(img, labels, os.path.join(output_folder, image_file), **(overlay or OVERLAY_DEFAULTS))
+
+    elements_coordinates = labels_to_coordinates(labels, width, height)
+
+    if detections is not None:
+        detections.append(os.path.splitext(image_file)[0], view, elements_coordinates)
+        output_file_path = detections.data_path
+    else:
         output_file_path = os.path.join(output_folder, f'{image_file.split(".")[0]}.txt')
         with open(output_file_path, "w") as output_file:
-            for coord in elements_coordinates:
-                output_file.write(f"{coord[0]}, {coord[1]}, {coord[2]}, {coord[3]}\n")
+            output_file.write(''.join(f"{xt}, {yt}, {xb}, {yb}\n" for xt, yt, xb, yb in elements_coordinates.tolist()))
+    if artifacts is not None:
+        artifacts.add_rows('detections', elements_coordinates, image=os.path.splitext(image_file)[0], view=view)
+    return output_file_path
+
+def submit_bounded(pool, func, jobs, limit):
+    """Run func(*args) on pool for every args in jobs; yields (args, future) in submission order.
+
+    Detected images hold their decoded pixels until func has run, so no more than limit
+    submissions are pending: the oldest is waited for before the next job is taken.
+    """
+    pending = deque()
+    for args in jobs:
+        pending.append((args, pool.submit(func, *args)))
+        while len(pending) > limit:
+            wait([pending[0][1]])
+            yield pending.popleft()
+    while pending:
+        yield pending.popleft()
+
+def main():
+    # Load configuration
+    config = load_config()
+    asbuilt_images = get_full_path(config['major_folder'], config['paths']['asbuilt_images'])
+    view_direction = get_view_direction(config)
+    output_folder = get_output_folder(config, view_direction)
+
+    detector = create_detector(config)
+    artifacts = writer_from_config(config)
+    detections = table_from_config(config)
+
+    # Ensure the output folder exists
+    os.makedirs(output_folder, exist_ok=True)
+
+    from overlay import overlay_settings
+    overlay = overlay_settings(config)
+    workers = overlay['workers']
+
+    # Each image is decoded once by the loader; the same pixels feed the overlay and
+    # the original (height, width) feeds the label conversion. Without overlays only the
+    # reduced-size decode needed for detection is done.
+    images = detector.detect_iter(list_images(asbuilt_images), keep_original=overlay['mode'] != 'off')
+    jobs = ((image_path, labels, shape, img, output_folder, view_direction, artifacts, detections, overlay)
+            for image_path, labels, shape, img in images)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for _, future in submit_bounded(pool, convert_image, jobs, 2 * workers):
+            future.result()
+
+    if artifacts is not None:
+        artifacts.flush()
+    compact_from_config(detections, config)
+
+if __name__ == "__main__":
+    main()
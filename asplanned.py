@@ -1,13 +1,11 @@
-import ifcopenshell
-import ifcopenshell.geom
-import ifcopenshell.util.shape
-import ifcopenshell.util.placement
-import ifcopenshell.util.element
-import pandas as pd
-import matplotlib.pyplot as plt
 import numpy as np
 import yaml
 import os
+import importlib.metadata
+import ifc_cache
+import facades
+import facade_index
+from artifacts import writer_from_config
 
 def load_config(config_file="user.yaml"):
     with open(config_file, 'r') as file:
@@ -24,252 +22,326 @@ def find_ifc_file(directory):
     return os.path.join(directory, ifc_files[0])
 
 
-# Load configuration
-config = load_config()
-major_folder = config['major_folder']
-paths = config['paths']
+# Options passed to ifcopenshell.geom.settings; part of the geometry cache key
+GEOMETRY_SETTINGS = {}
+
+def tessellate_columns(ifc_file, columns, settings, workers=1):
+    """Return {column id: flat verts}, using ifcopenshell's multi-threaded iterator when workers > 1"""
+    import ifcopenshell.geom
+
+    verts_by_id = {}
+    if workers > 1 and columns:
+        iterator = ifcopenshell.geom.iterator(settings, ifc_file, workers, include=columns)
+        if iterator.initialize():
+            while True:
+                shape = iterator.get()
+                verts_by_id[shape.id] = shape.geometry.verts
+                if not iterator.next():
+                    break
+
+    # Serial mode, and any column the iterator skipped
+    for column in columns:
+        if column.id() not in verts_by_id:
+            shape = ifcopenshell.geom.create_shape(settings, column)
+            verts_by_id[column.id()] = shape.geometry.verts
+    return verts_by_id
+
+def axis_placement_matrix(placement):
+    """4x4 matrix of an IfcAxis2Placement3D, identity when the placement is omitted"""
+    import ifcopenshell.util.placement
+    if placement is None:
+        return np.eye(4)
+    return np.asarray(ifcopenshell.util.placement.get_axis2placement(placement), dtype=np.float64)
+
+def mapping_target_matrix(operator):
+    """Translation of an IfcCartesianTransformationOperator3D, None if it also rotates or scales"""
+    if operator is None:
+        return np.eye(4)
+    if not operator.is_a('IfcCartesianTransformationOperator3D'):
+        return None
+    if operator.Axis1 or operator.Axis2 or operator.Axis3 or operator.Scale not in (None, 1.0):
+        return None
+    matrix = np.eye(4)
+    coordinates = operator.LocalOrigin.Coordinates
+    matrix[:len(coordinates), 3] = coordinates
+    return matrix
+
+def extrusion_z_range(column):
+    """Bottom and top elevation of a column's Body in its local frame (project units).
+
+    Only covers bodies built from IfcExtrudedAreaSolid items, directly or through a translated
+    IfcMappedItem, whose profile plane stays horizontal. Returns None for anything else so that
+    the column is tessellated instead.
+    """
+    if column.Representation is None:
+        return None
+    body = [rep for rep in column.Representation.Representations if rep.RepresentationIdentifier == 'Body']
+    if len(body) != 1:
+        return None
+
+    # (item, transform to the column's local frame) pairs, expanding mapped items
+    stack = [(item, np.eye(4)) for item in body[0].Items]
+    z_min, z_max = np.inf, -np.inf
+    while stack:
+        item, transform = stack.pop()
+        if item.is_a('IfcMappedItem'):
+            target = mapping_target_matrix(item.MappingTarget)
+            origin = item.MappingSource.MappingOrigin
+            if target is None or not origin.is_a('IfcAxis2Placement3D'):
+                return None
+            mapped = transform @ target @ axis_placement_matrix(origin)
+            stack.extend((sub_item, mapped) for sub_item in item.MappingSource.MappedRepresentation.Items)
+            continue
+        if not item.is_a('IfcExtrudedAreaSolid'):
+            return None
+
+        matrix = transform @ axis_placement_matrix(item.Position)
+        # The profile lies in the placement's XY plane; it must stay horizontal
+        if not np.allclose(matrix[2, :3], [0.0, 0.0, 1.0], atol=1e-9):
+            return None
+        direction = np.asarray(item.ExtrudedDirection.DirectionRatios, dtype=np.float64)
+        rise = item.Depth * direction[2] / np.linalg.norm(direction)
+        z_min = min(z_min, matrix[2, 3] + min(0.0, rise))
+        z_max = max(z_max, matrix[2, 3] + max(0.0, rise))
+    if not np.isfinite(z_min):
+        return None
+    return z_min, z_max
+
+def extract_columns(ifc_file_path, geometry_settings=GEOMETRY_SETTINGS, workers=1, mode='tessellate'):
+    """Extract every IfcColumn and return the per-column table stored in the IFC cache.
+
+    mode 'tessellate' meshes every column; mode 'fast' reads Ztop/Zbot from the extrusion
+    parameters and only meshes columns whose Body is not a plain vertical extrusion.
+    Columns resolved the fast way have no verts in the table.
+    """
+    import ifcopenshell
+    import ifcopenshell.geom
+    import ifcopenshell.util.placement
+    import ifcopenshell.util.element
+    import ifcopenshell.util.unit
+
+    # Extract and Calculate coordinates for columns
+    ifc_file = ifcopenshell.open(ifc_file_path)
+
+    # Get all elements in a container
+    for storey in ifc_file.by_type("IfcBuildingStorey"):
+        elements = ifcopenshell.util.element.get_decomposition(storey)
+        print(f"There are {len(elements)} located on storey {storey.Name}, they are:")
+        for element in elements:
+            print(element.Name)
+
+    columns = ifc_file.by_type("IfcColumn")
+    print("Number of columns is:", len(columns))
 
-# Construct full paths from the major folder and relative paths
-ifc_model_dir = get_full_path(major_folder, paths['ifc_model'])
-ifc_file_path = find_ifc_file(ifc_model_dir)
-
-#ifc_file_path = get_full_path(major_folder, paths['ifc_model'])
-east_txt_path = get_full_path(major_folder, paths['east_txt_path'])
-west_txt_path = get_full_path(major_folder, paths['west_txt_path'])
-north_txt_path = get_full_path(major_folder, paths['north_txt_path'])
-south_txt_path = get_full_path(major_folder, paths['south_txt_path'])
-view_direction = config['view_direction'].strip().lower()  # Read view direction from config
-
-# Extract and Calculate coordinates for columns
-ifc_file = ifcopenshell.open(ifc_file_path)
-
-# Get all elements in a container
-for storey in ifc_file.by_type("IfcBuildingStorey"):
-    elements = ifcopenshell.util.element.get_decomposition(storey)
-    print(f"There are {len(elements)} located on storey {storey.Name}, they are:")
-    for element in elements:
-        print(element.Name)
-
-columns = ifc_file.by_type("IfcColumn")
-print("Number of columns is:", len(columns))
-
-verts_list = []
-relative_list = []
-local_list = []
-mixed_list = []
-
-for column in columns:
     settings = ifcopenshell.geom.settings()
-    shape = ifcopenshell.geom.create_shape(settings, column)
-
-    column_info = {
-        'IfcID': column.id(),
-        'Name': column.Name if hasattr(column, 'Name') else None,
-        'Global ID': column.GlobalId,
-    }
-    
-    container = ifcopenshell.util.element.get_container(column)
-    container_name = container.Name
-    level_number = int(container_name.split()[-1])
-
-    verts = shape.geometry.verts
-    organized_verts = [(verts[i], verts[i+1], verts[i+2]) for i in range(0, len(verts), 3)] # 8 points
-
-    points = organized_verts
-    z_coordinates = [point[2] for point in points]
-    Ztop = round(max(z_coordinates), 2)
-    Zbot = round(min(z_coordinates), 2)
-    Height = Ztop - Zbot
-
-    matrix = ifcopenshell.util.placement.get_local_placement(column.ObjectPlacement)
-    placement = column.ObjectPlacement
-    coordinates = placement.RelativePlacement.Location.Coordinates if placement and hasattr(placement, 'RelativePlacement') and placement.RelativePlacement else []
-
-    mixed = [matrix[:,3][:3][0], matrix[:,3][:3][1], Ztop, Zbot, level_number]   
-
-    verts_list.append(list(verts))
-    relative_list.append(list(coordinates))
-    local_list.append(list(matrix[:,3][:3]))
-    mixed_list.append(mixed)
-
-df_verts = pd.DataFrame(verts_list)
-df_relative = pd.DataFrame(relative_list)
-df_local = pd.DataFrame(local_list)
-df_mixed = pd.DataFrame(mixed_list)
-
-merged_df = pd.concat([df_relative, df_local, df_mixed], axis=1)
-merged_df.columns = ["Rx", "Ry", "Rz", "Lx", "Ly", "Lz", "Mx", "My", "Mztop", "Mzbot", "Level"]
-print(merged_df)
-
-def round_list(lst, decimal_places=5):
-    return [[round(num, decimal_places) for num in sublist] for sublist in lst]
-
-rounded_mixed_list = round_list(mixed_list, decimal_places=2) # x y ztop zbot level
-
-print("This is rounded mixed list:")        
-for item in rounded_mixed_list:
-    print(item)
-
-max_x = max(col[0] for col in rounded_mixed_list)
-print("max X is:", max_x)
-outlier_east_col = [coord for coord in rounded_mixed_list if coord[0] == max_x]
-
-min_x = min(col[0] for col in rounded_mixed_list)
-print("min X is:", min_x)
-outlier_west_col = [coord for coord in rounded_mixed_list if coord[0] == min_x]
-
-max_y = max(col[1] for col in rounded_mixed_list)
-print("max Y is:", max_y)
-outlier_north_col = [coord for coord in rounded_mixed_list if coord[1] == max_y]
-
-min_y = min(coord[1] for coord in rounded_mixed_list)
-print("min Y is:", min_y)
-outlier_south_col = [coord for coord in rounded_mixed_list if coord[1] == min_y]
-
-print("\n" * 3)
-print("These are primary results:")
-
-print("Outlier East:", outlier_east_col)
-print("number of East col:", len(outlier_east_col))
-print("\n" * 1)
-
-print("Outlier West:", outlier_west_col)
-print("number of West col:", len(outlier_west_col))
-
-print("\n" * 1)
-
-print("Outlier North:", outlier_north_col)
-print("number of North col:", len(outlier_north_col))
-
-print("\n" * 1)
-
-print("Outlier South:", outlier_south_col)
-print("number of South col:", len(outlier_south_col))
-
-print("\n" * 1)
-
-print("TOTAL number of Columns", len(ifc_file.by_type('IfcColumn')))
+    for option, value in geometry_settings.items():
+        settings.set(getattr(settings, option), value)
+
+    z_by_id = {}
+    if mode == 'fast':
+        # Geometry output is in metres while the IFC stores project units
+        unit_scale = ifcopenshell.util.unit.calculate_unit_scale(ifc_file)
+        for column in columns:
+            z_range = extrusion_z_range(column)
+            if z_range is not None:
+                z_by_id[column.id()] = (z_range[0] * unit_scale, z_range[1] * unit_scale)
+        print(f"{len(z_by_id)} of {len(columns)} columns resolved from their extrusion parameters")
+
+    verts_by_id = tessellate_columns(ifc_file, [c for c in columns if c.id() not in z_by_id], settings, workers)
+
+    table = {field: [] for field in ifc_cache.COLUMN_FIELDS}
+    verts_offsets = [0]
+
+    for column in columns:
+        container = ifcopenshell.util.element.get_container(column)
+        container_name = container.Name
+        level_number = int(container_name.split()[-1])
+
+        if column.id() in z_by_id:
+            verts = np.zeros(0)
+            z_min, z_max = z_by_id[column.id()]
+        else:
+            verts = np.asarray(verts_by_id[column.id()], dtype=np.float64)
+            z_coordinates = verts[2::3]  # 8 points
+            z_min, z_max = z_coordinates.min(), z_coordinates.max()
+        Ztop = round(float(z_max), 2)
+        Zbot = round(float(z_min), 2)
+
+        matrix = ifcopenshell.util.placement.get_local_placement(column.ObjectPlacement)
+        placement = column.ObjectPlacement
+        coordinates = placement.RelativePlacement.Location.Coordinates if placement and hasattr(placement, 'RelativePlacement') and placement.RelativePlacement else []
+
+        table['ifc_id'].append(column.id())
+        table['name'].append(column.Name or '')
+        table['global_id'].append(column.GlobalId)
+        table['level'].append(level_number)
+        table['matrix'].append(matrix)
+        table['relative'].append(list(coordinates) + [np.nan] * (3 - len(coordinates)))
+        table['ztop'].append(Ztop)
+        table['zbot'].append(Zbot)
+        table['verts'].append(verts)
+        verts_offsets.append(verts_offsets[-1] + len(verts))
+
+    table['verts'] = np.concatenate(table['verts']) if columns else np.zeros(0)
+    table['verts_offsets'] = np.asarray(verts_offsets, dtype=np.int64)
+    table['ifc_id'] = np.asarray(table['ifc_id'], dtype=np.int64)
+    table['name'] = np.asarray(table['name'], dtype=str)
+    table['global_id'] = np.asarray(table['global_id'], dtype=str)
+    table['level'] = np.asarray(table['level'], dtype=np.int64)
+    table['matrix'] = np.asarray(table['matrix'], dtype=np.float64).reshape(-1, 4, 4)
+    table['relative'] = np.asarray(table['relative'], dtype=np.float64).reshape(-1, 3)
+    table['ztop'] = np.asarray(table['ztop'], dtype=np.float64)
+    table['zbot'] = np.asarray(table['zbot'], dtype=np.float64)
+    return table
+
+def ifcopenshell_version():
+    """Installed ifcopenshell version, from package metadata so it is not imported on a cache hit"""
+    try:
+        return importlib.metadata.version('ifcopenshell')
+    except importlib.metadata.PackageNotFoundError:
+        # Conda and prebuilt-zip installs may come without dist metadata
+        import ifcopenshell
+        return getattr(ifcopenshell, 'version', 'unknown')
+
+def load_or_extract_columns(ifc_file_path, cache_dir, geometry_settings=GEOMETRY_SETTINGS, workers=1, mode='tessellate'):
+    """Return the column table, reusing the on-disk cache when the IFC content is unchanged"""
+    settings_key = {'ifcopenshell': ifcopenshell_version(), 'options': geometry_settings, 'mode': mode}
+    key = ifc_cache.cache_key(ifc_cache.file_sha256(ifc_file_path), settings_key)
+    path = ifc_cache.cache_path(cache_dir, key)
+
+    table = ifc_cache.load_columns(path)
+    if table is not None:
+        print(f"Loaded {len(table['ifc_id'])} columns from IFC cache {path}")
+        return table
+
+    table = extract_columns(ifc_file_path, geometry_settings, workers, mode)
+    ifc_cache.save_columns(path, table)
+    print(f"Saved IFC column cache to {path}")
+    return table
+
+# Compass bearing each named facade faces
+VIEW_BEARINGS = {'east': 90.0, 'west': 270.0, 'north': 0.0, 'south': 180.0}
+
+def extraction_settings(config):
+    """IFC extraction threads (0 = all cores, 1 = one column at a time) and mode from the config"""
+    extraction_config = config.get('ifc_extraction') or {}
+    geometry_workers = extraction_config.get('workers', 0) or os.cpu_count() or 1
+    extraction_mode = extraction_config.get('mode', 'tessellate')
+    if extraction_mode not in ('tessellate', 'fast'):
+        raise ValueError(f"Unknown IFC extraction mode: {extraction_mode}")
+    return geometry_workers, extraction_mode
+
+def columns_array(column_table):
+    """x y ztop zbot level per column"""
+    return np.column_stack([column_table['matrix'][:, 0, 3], column_table['matrix'][:, 1, 3],
+                            column_table['ztop'], column_table['zbot'], column_table['level']])
+
+def extract_planned_columns(ifc_file_path, cache_dir=None, workers=1, mode='tessellate'):
+    """Return the (N, 5) x, y, ztop, zbot, level array of every IfcColumn in an IFC file"""
+    if cache_dir is None:
+        return columns_array(extract_columns(ifc_file_path, workers=workers, mode=mode))
+    return columns_array(load_or_extract_columns(ifc_file_path, cache_dir, workers=workers, mode=mode))
+
+def facade_masks(columns, facade_mode='extreme', tolerance=0.0, lane_width=None, views=tuple(VIEW_BEARINGS),
+                 cache_dir=None):
+    """Return {view or bearing: boolean mask over the columns} of each facade's columns"""
+    rounded_mixed = np.round(columns, 2) # x y ztop zbot level
+
+    if facade_mode == 'extreme':
+        # The outermost columns of every facade in one pass
+        return facades.select_facades(rounded_mixed, views, tolerance)
+    if facade_mode == 'visibility':
+        # Per-storey visibility sweep, which also finds setbacks and non-rectangular plans
+        column_index = facade_index.ColumnIndex(rounded_mixed, lane_width=lane_width,
+                                                depth_tolerance=tolerance, cache_dir=cache_dir)
+        return {view: column_index.visible(VIEW_BEARINGS.get(view, view)) for view in views}
+    raise ValueError(f"Unknown facade mode: {facade_mode}")
+
+def masked_elevations(columns, masks):
+    """Return {view or bearing: (M, 5) elevation coordinates} of each mask's columns"""
+    rounded_mixed = np.round(columns, 2) # x y ztop zbot level
+    return {view: facades.to_elevation(rounded_mixed[mask], view) for view, mask in masks.items()}
+
+def planned_facades(columns, facade_mode='extreme', tolerance=0.0, lane_width=None, bearings=(), cache_dir=None):
+    """Return {view or bearing: (M, 5) elevation coordinates} of the facade columns"""
+    masks = facade_masks(columns, facade_mode, tolerance, lane_width, tuple(VIEW_BEARINGS) + tuple(bearings), cache_dir)
+    return masked_elevations(columns, masks)
+
+def load_planned(config, bearings=()):
+    """Find the project's IFC model, extract its columns through the IFC cache and select the facades.
+
+    Returns the column table, {view or bearing: facade mask over its columns} and
+    {view or bearing: (M, 5) elevation coordinates}, for the four views plus bearings.
+    """
+    major_folder = config['major_folder']
+    paths = config['paths']
+    ifc_file_path = find_ifc_file(get_full_path(major_folder, paths['ifc_model']))
+    ifc_cache_dir = get_full_path(major_folder, paths.get('ifc_cache_folder', 'advanced/ifc_cache'))
+    geometry_workers, extraction_mode = extraction_settings(config)
+
+    column_table = load_or_extract_columns(ifc_file_path, ifc_cache_dir, workers=geometry_workers, mode=extraction_mode)
+    columns = columns_array(column_table)
+    masks = facade_masks(columns, facade_mode=config.get('facade_mode', 'extreme'),
+                         tolerance=config.get('facade_tolerance', 0.0), lane_width=config.get('facade_lane_width'),
+                         views=tuple(VIEW_BEARINGS) + tuple(bearings), cache_dir=ifc_cache_dir)
+    return column_table, masks, masked_elevations(columns, masks)
 
 def save_to_file(filename, data):
     with open(filename, 'w') as file:
-        for entry in data:
-            file.write(', '.join(map(str, entry)) + '\n')
-
-#save_to_file(east_txt_path, outlier_east_col)
-#save_to_file(west_txt_path, outlier_west_col)
-#save_to_file(north_txt_path, outlier_north_col)
-#save_to_file(south_txt_path, outlier_south_col)
-
-
-# transform coordinates for east
-e_transformed_coord = []
-e_xmax = max(col[0] for col in outlier_east_col)
-e_ymax = max(col[1] for col in outlier_east_col)
-print(e_xmax)
-print(e_ymax)
-for col in outlier_east_col:
-    x , y , zt, zb, l = col
-    xt_transformed = y
-    yt_transformed = zt
-    xb_transformed = y
-    yb_transformed = zb
-    e_transformed_coord.append([xt_transformed, yt_transformed, xb_transformed, yb_transformed, l])
-print(e_transformed_coord)
-
-# transform coordinates for west
-w_transformed_coord = []
-w_xmax = max(col[0] for col in outlier_west_col)
-w_ymax = max(col[1] for col in outlier_west_col)
-print(w_xmax)
-print(w_ymax)
-for col in outlier_west_col:
-    x , y , zt, zb, l = col
-    xt_transformed = w_ymax-y
-    yt_transformed = zt
-    xb_transformed = w_ymax-y
-    yb_transformed = zb
-    w_transformed_coord.append([xt_transformed, yt_transformed, xb_transformed, yb_transformed, l])
-print(w_transformed_coord)
-
-# transform coordinates for north
-n_transformed_coord = []
-n_xmax = max(col[0] for col in outlier_north_col)
-n_ymax = max(col[1] for col in outlier_north_col)
-print(n_xmax)
-print(n_ymax)
-for col in outlier_north_col:
-    x , y , zt, zb, l = col
-    xt_transformed = n_xmax-x
-    yt_transformed = zt
-    xb_transformed = n_xmax-x
-    yb_transformed = zb
-    n_transformed_coord.append([xt_transformed, yt_transformed, xb_transformed, yb_transformed, l])
-print(n_transformed_coord)
-
-# transform coordinates for south
-s_transformed_coord = []
-s_xmax = max(col[0] for col in outlier_south_col)
-s_ymax = max(col[1] for col in outlier_south_col)
-print(s_xmax)
-print(s_ymax)
-for col in outlier_south_col:
-    x , y , zt, zb, l = col
-    xt_transformed = x
-    yt_transformed = zt
-    xb_transformed = x
-    yb_transformed = zb
-    s_transformed_coord.append([xt_transformed, yt_transformed, xb_transformed, yb_transformed, l])
-print(s_transformed_coord)
-
-
-save_to_file(east_txt_path, e_transformed_coord)
-save_to_file(west_txt_path, w_transformed_coord)
-save_to_file(north_txt_path, n_transformed_coord)
-save_to_file(south_txt_path, s_transformed_coord)
-
-
-
-
-# Draft section
-'''
-# convert coordinates based on viewpoint
-def transform_coordinates(col_list , view_direction):
-    transformed_coordinates = []
-    xmax = max(col[0] for col in col_list)
-    ymax = max(col[1] for col in col_list)
-    for coord in col_list:
-        x , y , zt, zb, l = col_list
-        if view_direction == 'east':
-            xt_transformed = y
-            yt_transformed = zt
-            xb_transformed = y
-            yb_transformed = zb
-        elif view_direction == 'west':
-            xt_transformed == ymax-y
-            yt_transformed = zt
-            xb_transformed = ymax-y
-            yb_transformed = zb
-        elif view_direction == 'north':
-            xt_transformed == xmax-x
-            yt_transformed = zt
-            xb_transformed = xmax-x
-            yb_transformed = zb
-        elif view_direction == 'south':
-            xt_transformed == x
-            yt_transformed = zt
-            xb_transformed = x
-            yb_transformed = zb
-        else:
-            raise ValueError("Invalid view direction. Use 'east', 'west', 'north', or 'south'.")
-    return
-
-
-print("*" * 20)
-print(outlier_east_col[0])
-
-e_transformed_coord = []
-for col in outlier_east_col:
-
-
-
-'''
\ No newline at end of file
+        for xt, yt, xb, yb, level in data.tolist():
+            file.write(', '.join(map(str, [xt, yt, xb, yb, int(level)])) + '\n')
+
+def main():
+    import pandas as pd
+
+    # Load configuration
+    config = load_config()
+    major_folder = config['major_folder']
+    paths = config['paths']
+
+    bearings = config.get('facade_bearings', []) or []
+    column_table, _, transformed = load_planned(config, bearings)
+    mixed = columns_array(column_table)
+
+    df_relative = pd.DataFrame(column_table['relative'])
+    df_local = pd.DataFrame(column_table['matrix'][:, :3, 3])
+    df_mixed = pd.DataFrame(mixed)
+
+    merged_df = pd.concat([df_relative, df_local, df_mixed], axis=1)
+    merged_df.columns = ["Rx", "Ry", "Rz", "Lx", "Ly", "Lz", "Mx", "My", "Mztop", "Mzbot", "Level"]
+    print(merged_df)
+
+    rounded_mixed = np.round(mixed, 2)
+    print("max X is:", rounded_mixed[:, 0].max())
+    print("min X is:", rounded_mixed[:, 0].min())
+    print("max Y is:", rounded_mixed[:, 1].max())
+    print("min Y is:", rounded_mixed[:, 1].min())
+
+    print("\n" * 1)
+    print("These are primary results:")
+    for view in VIEW_BEARINGS:
+        print(f"number of {view.capitalize()} col:", len(transformed[view]))
+
+    print("TOTAL number of Columns", len(mixed))
+
+    for view in VIEW_BEARINGS:
+        save_to_file(get_full_path(major_folder, paths[f'{view}_txt_path']), transformed[view])
+
+    # Extra facades at arbitrary bearings, written next to the named ones as facade_<bearing>.txt
+    east_txt_path = get_full_path(major_folder, paths['east_txt_path'])
+    for bearing in bearings:
+        bearing_txt_path = os.path.join(os.path.dirname(east_txt_path), f"facade_{bearing:g}.txt")
+        save_to_file(bearing_txt_path, transformed[bearing])
+        print(f"number of columns facing {bearing:g} degrees:", len(transformed[bearing]))
+
+    # Typed planned table for the later stages, keyed by view
+    artifacts = writer_from_config(config)
+    if artifacts is not None:
+        for view in VIEW_BEARINGS:
+            artifacts.add_rows('planned', transformed[view], view=view)
+        for bearing in bearings:
+            artifacts.add_rows('planned', transformed[bearing], view=f"{bearing:g}")
+        artifacts.flush()
+
+if __name__ == "__main__":
+    main()
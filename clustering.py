@@ -0,0 +1,52 @@
+import numpy as np
+
+
+def gap_eps(x, factor=1.2):
+    """Clustering distance used by the floor recognition: the average gap between sorted x values times factor.
+
+    With fewer than two distinct values there is no gap to average; a unit gap is used
+    instead, so eps stays positive and all values form one cluster.
+    """
+    gaps = np.diff(np.sort(np.asarray(x, dtype=np.float64).ravel()))
+    if not np.any(gaps > 0):
+        return 1.0 * factor
+    return np.average(gaps) * factor
+
+
+def gap_clusters(x, eps):
+    """Cluster 1-D values by splitting the sorted values wherever the gap exceeds eps.
+
+    Gives the same labels as sklearn's DBSCAN(eps=eps, min_samples=1) on x.reshape(-1, 1):
+    clusters are numbered 0, 1, ... in order of their first member in x, and there is no noise.
+    """
+    return gap_clusters_batched([x], [eps])[0]
+
+
+def gap_clusters_batched(xs, eps):
+    """gap_clusters over many images at once: a list of 1-D arrays and one eps per array"""
+    sizes = np.array([len(x) for x in xs], dtype=np.int64)
+    eps = np.asarray(eps, dtype=np.float64)
+    if not np.all(eps > 0):
+        raise ValueError(f"eps must be > 0, got {eps[~(eps > 0)][0]}")
+    if sizes.sum() == 0:
+        return [np.zeros(0, dtype=np.int64) for _ in xs]
+
+    x = np.concatenate([np.asarray(values, dtype=np.float64).ravel() for values in xs])
+    image = np.repeat(np.arange(len(xs)), sizes)
+
+    # One sort by (image, x); a new cluster starts at every image change or gap wider than eps
+    order = np.lexsort((x, image))
+    x_sorted, image_sorted = x[order], image[order]
+    starts = np.r_[True, (image_sorted[1:] != image_sorted[:-1]) | (np.diff(x_sorted) > eps[image_sorted[1:]])]
+    component = np.empty(len(x), dtype=np.int64)
+    component[order] = np.cumsum(starts) - 1
+
+    # Renumber each image's clusters by their first member in input order
+    _, first = np.unique(component, return_index=True)
+    component_image = image[first]
+    by_appearance = np.lexsort((first, component_image))
+    image_offsets = np.searchsorted(component_image[by_appearance], np.arange(len(xs)))
+    labels = np.empty(len(first), dtype=np.int64)
+    labels[by_appearance] = np.arange(len(first)) - image_offsets[component_image[by_appearance]]
+
+    return np.split(labels[component], np.cumsum(sizes)[:-1])
@@ -2,7 +2,102 @@ import os
 import sys
 import importlib
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+import yaml
+from manifest import RunManifest, hash_values
+from artifacts import writer_from_config
+from detection_table import table_from_config, compact_from_config
+from overlay import overlay_settings
+from progress_store import store_from_config
+
+def load_config(config_file="user.yaml"):
+    with open(config_file, 'r') as file:
+        config = yaml.safe_load(file)
+    return config
+
+class TaskGraph:
+    """Run tasks on a worker pool as soon as all of their dependencies have finished.
+
+    Tasks may be added while the graph is running, so a stage can schedule follow-up
+    work for each item it produces. A task whose dependency failed is skipped.
+    A task added with dedicated=True runs on its own thread, so it may block on work
+    it scheduled on the pool without taking a worker away from that work.
+    """
+
+    def __init__(self, workers, logger):
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self.logger = logger
+        self.lock = threading.Condition()
+        self.tasks = {}       # name -> (func, deps, dedicated)
+        self.waiting = {}     # name -> set of unfinished deps
+        self.results = {}
+        self.failed = set()
+        self.pending = 0
+
+    def add(self, name, func, deps=(), dedicated=False):
+        with self.lock:
+            self.tasks[name] = (func, tuple(deps), dedicated)
+            self.pending += 1
+            if any(dep in self.failed for dep in deps):
+                self._finish(name, failed=True)
+                return name
+            unfinished = {dep for dep in deps if dep not in self.results}
+            if unfinished:
+                self.waiting[name] = unfinished
+            else:
+                self._start(name)
+        return name
+
+    def result(self, name):
+        return self.results[name]
+
+    def _start(self, name):
+        if self.tasks[name][2]:
+            threading.Thread(target=self._run, args=(name,), name=name, daemon=True).start()
+        else:
+            self.pool.submit(self._run, name)
+
+    def _run(self, name):
+        func, _, _ = self.tasks[name]
+        try:
+            result = func()
+        except Exception as e:
+            self.logger.error(f"Task {name} failed: {str(e)}")
+            with self.lock:
+                self._finish(name, failed=True)
+            return
+        with self.lock:
+            self.results[name] = result
+            self._finish(name, failed=False)
+
+    def _finish(self, name, failed):
+        # Called with the lock held
+        if failed:
+            self.failed.add(name)
+        for other, unfinished in list(self.waiting.items()):
+            if name not in unfinished:
+                continue
+            if failed:
+                del self.waiting[other]
+                self.logger.warning(f"Skipping {other}: dependency {name} failed")
+                self._finish(other, failed=True)
+            else:
+                unfinished.discard(name)
+                if not unfinished:
+                    del self.waiting[other]
+                    self._start(other)
+        self.pending -= 1
+        self.lock.notify_all()
+
+    def wait(self):
+        """Block until every added task has finished or been skipped"""
+        with self.lock:
+            while self.pending:
+                self.lock.wait()
+        self.pool.shutdown()
+        return not self.failed
 
 class CPMIPController:
     def __init__(self):
@@ -105,6 +200,174 @@ class CPMIPController:
         self.logger.info("Pipeline completed successfully")
         return True
 
+    def run_graph(self, workers=4, incremental=False):
+        """Run the pipeline as a task graph: asplanned runs alongside detection, and each
+        image flows through convert, floor recognition and progress as soon as it is detected.
+        With incremental=True, stages whose inputs are unchanged since the last run are skipped."""
+        self.logger.info("Starting CPMIP task graph execution")
+
+        asbuilt = self.import_module('asbuilt')
+        floor_rec = self.import_module('FloorRec_multi')
+        progress = self.import_module('progress_multi')
+        if asbuilt is None or floor_rec is None or progress is None:
+            return False
+
+        config = load_config()
+        major_folder = config['major_folder']
+        paths = config['paths']
+        view = asbuilt.get_view_direction(config)
+        asbuilt_images = asbuilt.get_full_path(major_folder, paths['asbuilt_images'])
+        output_folder_base = asbuilt.get_full_path(major_folder, paths['output_folder_base'])
+        output_folder = asbuilt.get_output_folder(config, view)
+        os.makedirs(output_folder, exist_ok=True)
+
+        manifest = None
+        if incremental:
+            manifest = RunManifest(asbuilt.get_full_path(major_folder, paths.get('run_manifest', 'advanced/run_manifest.json')))
+
+        def cached(stage, key, inputs, func, outputs):
+            """Run func unless the manifest says its outputs are up to date; returns the main output"""
+            if manifest is not None and manifest.is_fresh(stage, key, inputs()):
+                self.logger.info(f"Skipping {stage}:{key}, inputs unchanged")
+                return manifest.outputs(stage, key)[0]
+            result = func()
+            if manifest is not None and result is not None:
+                manifest.record(stage, key, inputs(), outputs(result))
+            return result
+
+        # Typed tables shared by the stages in memory and written once at the end of the run
+        artifacts = writer_from_config(config)
+        # With detection_output "table", every image's coordinates go to one indexed file
+        detections = table_from_config(config)
+        overlay = overlay_settings(config)
+        # With progress_history enabled, every image's progress is also filed under the survey date
+        history = store_from_config(config)
+        floor_settings = floor_rec.floor_settings(config)
+        thresholds = {key: floor_settings[key] for key in ('distance_threshold', 'tolerance')}
+
+        graph = TaskGraph(workers, self.logger)
+
+        # asplanned: depends on the IFC content and the config keys that shape the planned tables
+        planned_outputs = [asbuilt.get_full_path(major_folder, paths[f'{side}_txt_path'])
+                           for side in ('east', 'west', 'north', 'south')]
+
+        def asplanned_inputs():
+            ifc_dir = asbuilt.get_full_path(major_folder, paths['ifc_model'])
+            ifc_files = sorted(f for f in os.listdir(ifc_dir) if f.endswith('.ifc'))
+            settings = {key: config.get(key) for key in
+                        ('ifc_extraction', 'facade_mode', 'facade_tolerance', 'facade_lane_width', 'facade_bearings')}
+            return {'ifc': [manifest.file_hash(os.path.join(ifc_dir, f)) for f in ifc_files],
+                    'settings': hash_values(settings), 'outputs': planned_outputs}
+
+        def run_asplanned():
+            if not self.run_module('asplanned'):
+                raise RuntimeError("asplanned failed")
+            return planned_outputs[0]
+
+        # Decoded images waiting for conversion are held in memory, so bound how far
+        # detection may run ahead of the conversion stage. Detection runs on its own thread
+        # (see below), so the pool's workers stay free for the conversions that release slots
+        in_flight = threading.BoundedSemaphore(2 * workers)
+        model_path = asbuilt.get_full_path(major_folder, paths['model'])
+
+        def manifest_key(name):
+            # Each view direction has its own <view>_output, so entries are kept per view
+            return f"{view}/{name}"
+
+        def detect_inputs(image_path):
+            return lambda: {'image': manifest.file_hash(image_path), 'weights': manifest.file_hash(model_path),
+                            'settings': hash_values(asbuilt.detection_settings(config))}
+
+        def add_downstream_tasks(name, image_path, convert):
+            def run_floor():
+                coords_file = graph.result(convert)
+                return cached('floor', manifest_key(name),
+                              lambda: {'coords': detections.digest(name, view) if detections is not None
+                                                 else manifest.file_hash(coords_file),
+                                       'settings': hash_values(thresholds)},
+                              lambda: floor_rec.process_image(image_path, view, output_folder_base, artifacts, detections,
+                                                              **thresholds),
+                              lambda floor_file: [floor_file])
+            floor = graph.add(f"floor:{name}", run_floor, [convert])
+
+            def run_progress():
+                floor_file = graph.result(floor)
+                if floor_file is None:
+                    self.logger.warning(f"No floor info for {name}, skipping progress")
+                    return None
+                planned_file = progress.get_asplanned_path(config, view)
+
+                def compute_progress():
+                    results = progress.process_floor_file(graph.result('planned'), floor_file, view, output_folder_base,
+                                                          artifacts, history)
+                    if results is None:
+                        return None
+                    return os.path.join(output_folder_base, f"{view}_{name}_construction_percentage.txt")
+                return cached('progress', manifest_key(name),
+                              lambda: {'floor': manifest.file_hash(floor_file), 'planned': manifest.file_hash(planned_file),
+                                       'survey': history.survey() if history is not None else None},
+                              compute_progress, lambda percentage_file: [percentage_file])
+            graph.add(f"progress:{name}", run_progress, [floor, 'planned'])
+
+        def add_image_tasks(image_path, labels, shape, img):
+            name = os.path.splitext(os.path.basename(image_path))[0]
+
+            def run_convert():
+                try:
+                    coords_file = asbuilt.convert_image(image_path, labels, shape, img, output_folder, view, artifacts,
+                                                        detections, overlay)
+                finally:
+                    in_flight.release()
+                if manifest is not None:
+                    manifest.record('asbuilt', manifest_key(name), detect_inputs(image_path)(), [coords_file])
+                return coords_file
+            convert = graph.add(f"convert:{name}", run_convert)
+            add_downstream_tasks(name, image_path, convert)
+
+        def run_detection():
+            # Images whose bytes, weights and detection settings are unchanged keep their coordinates
+            image_files = []
+            for image_path in asbuilt.list_images(asbuilt_images):
+                name = os.path.splitext(os.path.basename(image_path))[0]
+                if manifest is not None and manifest.is_fresh('asbuilt', manifest_key(name), detect_inputs(image_path)()) \
+                        and (detections is None or (view, name) in detections):
+                    coords_file = manifest.outputs('asbuilt', manifest_key(name))[0]
+                    add_downstream_tasks(name, image_path, graph.add(f"convert:{name}", lambda f=coords_file: f))
+                else:
+                    image_files.append(image_path)
+            self.logger.info(f"{len(image_files)} images need detection")
+            if not image_files:
+                return
+
+            detector = asbuilt.create_detector(config)
+            count = 0
+            # Downstream tasks are scheduled per image as soon as its batch is detected
+            for image_path, labels, shape, img in detector.detect_iter(image_files, keep_original=overlay['mode'] != 'off'):
+                in_flight.acquire()
+                add_image_tasks(image_path, labels, shape, img)
+                count += 1
+            self.logger.info(f"Detection finished for {count} images")
+
+        graph.add('asplanned', lambda: cached('asplanned', 'model', asplanned_inputs, run_asplanned, lambda _: planned_outputs))
+        graph.add('planned', lambda: progress.load_asplanned(config, view), ['asplanned'])
+        graph.add('detect', run_detection, dedicated=True)
+
+        try:
+            success = graph.wait()
+        finally:
+            if manifest is not None:
+                manifest.save()
+            if artifacts is not None:
+                artifacts.flush()
+            if history is not None:
+                history.close()
+            compact_from_config(detections, config)
+        if success:
+            self.logger.info("Task graph completed successfully")
+        else:
+            self.logger.error(f"Task graph finished with {len(graph.failed)} failed tasks")
+        return success
+
 def main():
     # Create controller instance
     controller = CPMIPController()
@@ -112,8 +375,17 @@ def main():
     # You can start from a specific point if needed
     # controller.run_pipeline(start_from='asbuilt_analysis')
     
-    # Or run the complete pipeline
-    controller.run_pipeline()
+    # Or run the complete pipeline, either module by module or as a per-image task graph
+    pipeline_config = load_config().get('pipeline') or {}
+    if pipeline_config.get('mode', 'linear') == 'dag':
+        controller.run_graph(workers=pipeline_config.get('workers', 4),
+                             incremental=pipeline_config.get('incremental', False))
+    elif pipeline_config.get('mode') == 'multi_view':
+        controller.run_module('multiview')
+    elif pipeline_config.get('mode') == 'watch':
+        controller.run_module('watch')
+    else:
+        controller.run_pipeline()
 
 if __name__ == "__main__":
     main()
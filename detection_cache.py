@@ -0,0 +1,201 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+from manifest import hash_values
+from image_pipeline import decode_ahead
+
+# Defaults for the optional `detection_cache` section of user.yaml
+CACHE_DEFAULTS = {'enabled': False, 'max_mb': 512, 'memory_entries': 1024}
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DetectionCache:
+    """Content-addressed store of detection results: key -> (labels, (height, width)).
+
+    Entries live as <key>.npz files in a folder capped at max_bytes, evicting the least
+    recently used file first (the file mtime records its last use, so the order survives
+    restarts), with an in-memory LRU of up to memory_entries results in front of it for
+    long-running processes.
+    """
+
+    def __init__(self, folder, max_bytes=512 << 20, memory_entries=1024):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.memory_entries = memory_entries
+        self.lock = threading.Lock()
+        self.memory = OrderedDict()
+        os.makedirs(folder, exist_ok=True)
+
+        # Disk index in least recently used order: key -> file size
+        entries = []
+        for entry in os.scandir(folder):
+            if entry.name.endswith('.npz'):
+                st = entry.stat()
+                entries.append((st.st_mtime_ns, entry.name[:-4], st.st_size))
+        self.files = OrderedDict((key, size) for _, key, size in sorted(entries))
+        self.total_bytes = sum(self.files.values())
+
+    def path(self, key):
+        return os.path.join(self.folder, f"{key}.npz")
+
+    def _remember(self, key, value):
+        # Called with the lock held
+        self.memory[key] = value
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_entries:
+            self.memory.popitem(last=False)
+
+    def get(self, key):
+        """(labels, (height, width)) for a key, or None"""
+        with self.lock:
+            value = self.memory.get(key)
+            if value is not None:
+                self.memory.move_to_end(key)
+            if key in self.files:
+                self.files.move_to_end(key)
+            elif value is None:
+                return None
+        if value is not None:
+            try:
+                os.utime(self.path(key))
+            except OSError:
+                pass
+            return value
+        try:
+            with np.load(self.path(key)) as data:
+                value = (data['labels'], tuple(int(v) for v in data['shape']))
+            os.utime(self.path(key))
+        except (OSError, ValueError, KeyError):
+            # Evicted by another process or unreadable
+            with self.lock:
+                self.total_bytes -= self.files.pop(key, 0)
+            return None
+        with self.lock:
+            if key in self.files:
+                self.files.move_to_end(key)
+            self._remember(key, value)
+        return value
+
+    def put(self, key, labels, shape):
+        labels = np.asarray(labels, dtype=np.float32).reshape(-1, 5)
+        tmp_path = self.path(key) + f".{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, labels=labels, shape=np.asarray(shape, dtype=np.int64))
+        os.replace(tmp_path, self.path(key))
+        size = os.path.getsize(self.path(key))
+
+        evicted = []
+        with self.lock:
+            self.total_bytes += size - self.files.pop(key, 0)
+            self.files[key] = size
+            self._remember(key, (labels, tuple(shape)))
+            while self.total_bytes > self.max_bytes and len(self.files) > 1:
+                old_key, old_size = self.files.popitem(last=False)
+                self.total_bytes -= old_size
+                self.memory.pop(old_key, None)
+                evicted.append(old_key)
+        for old_key in evicted:
+            try:
+                os.remove(self.path(old_key))
+            except OSError:
+                pass
+
+
+class CachedDetector:
+    """detect_iter/detect in front of a detector, answering unchanged images from a DetectionCache.
+
+    The key covers the image bytes, the weights file and the detection settings. The model is
+    only loaded (through detector_factory) once an image misses the cache, so runs that only
+    change the stages after detection never load it.
+    """
+
+    def __init__(self, detector_factory, cache, model_path, settings, decode_workers=None, prefetch=2):
+        self.detector_factory = detector_factory
+        self.cache = cache
+        self.model_path = model_path
+        self.settings = settings
+        self.decode_workers = decode_workers
+        self.prefetch = prefetch
+        self.lock = threading.Lock()
+        self._detector = None
+        self._weights = None
+        self._image_hashes = {}
+
+    @property
+    def detector(self):
+        with self.lock:
+            if self._detector is None:
+                self._detector = self.detector_factory()
+            return self._detector
+
+    def key(self, image_path):
+        # Image hashes are remembered with the file's mtime and size, weights hash once per file state
+        st = os.stat(image_path)
+        stamp = (st.st_mtime_ns, st.st_size)
+        cached = self._image_hashes.get(image_path)
+        if cached is None or cached[0] != stamp:
+            cached = (stamp, file_sha256(image_path))
+            self._image_hashes[image_path] = cached
+        weights_stat = os.stat(self.model_path)
+        weights_stamp = (weights_stat.st_mtime_ns, weights_stat.st_size)
+        if self._weights is None or self._weights[0] != weights_stamp:
+            self._weights = (weights_stamp, file_sha256(self.model_path))
+        return hash_values({'image': cached[1], 'weights': self._weights[1], 'settings': self.settings})
+
+    def detect_iter(self, image_paths, keep_original=False):
+        """Yield (image_path, labels, (height, width), original image): cached images first,
+        then the rest as the model finishes them"""
+        hits, misses = {}, {}
+        for image_path in image_paths:
+            try:
+                key = self.key(image_path)
+            except OSError:
+                # Let the detector report the unreadable file
+                misses[image_path] = None
+                continue
+            value = self.cache.get(key)
+            if value is None:
+                misses[image_path] = key
+            else:
+                hits[image_path] = value
+        print(f"Detection cache: {len(hits)} hits, {len(misses)} misses")
+
+        if keep_original:
+            for image_path, img in decode_ahead(list(hits), self.decode_workers, self.prefetch):
+                if img is None:
+                    print(f"Warning: Could not read image {image_path}. Skipping.")
+                    continue
+                labels, shape = hits[image_path]
+                yield image_path, labels, shape, img
+        else:
+            for image_path, (labels, shape) in hits.items():
+                yield image_path, labels, shape, None
+
+        if misses:
+            for image_path, labels, shape, img in self.detector.detect_iter(list(misses), keep_original):
+                if misses.get(image_path) is not None:
+                    self.cache.put(misses[image_path], labels, shape)
+                yield image_path, labels, shape, img
+
+    def detect(self, image_paths):
+        """Detect columns in a list of images, returns {image_path: (K, 5) array}"""
+        return {path: labels for path, labels, _, _ in self.detect_iter(image_paths)}
+
+
+def cache_from_config(config):
+    """DetectionCache of the optional `detection_cache` section, or None when it is disabled"""
+    settings = dict(CACHE_DEFAULTS, **(config.get('detection_cache') or {}))
+    if not settings['enabled']:
+        return None
+    folder = os.path.join(config['major_folder'], config['paths'].get('detection_cache', 'advanced/detection_cache'))
+    return DetectionCache(folder, max_bytes=int(settings['max_mb'] * (1 << 20)),
+                          memory_entries=settings['memory_entries'])
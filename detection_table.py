@@ -0,0 +1,174 @@
+import os
+import json
+import hashlib
+import threading
+import numpy as np
+
+# Rows are xt, yt, xb, yb as little-endian float64
+ROW_FIELDS = 4
+ROW_DTYPE = np.dtype('<f8')
+ROW_BYTES = ROW_FIELDS * ROW_DTYPE.itemsize
+# Compact after a run once at least this fraction of the stored rows is superseded
+COMPACT_THRESHOLD = 0.5
+
+_tables = {}
+_tables_lock = threading.Lock()
+
+
+class DetectionTable:
+    """Detections of a whole run in one append-only file with an image index.
+
+    `<path>.bin` holds the coordinate rows of every image back to back and `<path>.idx` one
+    JSON line per image: [view, image, first row, row count, sha256 of the rows]. Rows are
+    written before their index line, so a torn write at the end is ignored on the next open.
+    Appending an image again supersedes its earlier rows; compact() drops the superseded ones,
+    and the stages call maybe_compact() at the end of a run so the file does not grow without bound.
+    One process writes at a time; threads share an instance.
+    """
+
+    def __init__(self, path):
+        self.data_path = path + '.bin'
+        self.index_path = path + '.idx'
+        self.lock = threading.Lock()
+        self.index = {}
+        self._reader = None
+        self._writer = None
+        self._index_writer = None
+        self._load_index()
+
+    def _load_index(self):
+        # Also find where the last complete entry ends, so that appends overwrite a torn tail
+        self._data_end = 0
+        self._index_end = 0
+        if not os.path.exists(self.index_path):
+            return
+        data_rows = os.path.getsize(self.data_path) // ROW_BYTES if os.path.exists(self.data_path) else 0
+        with open(self.index_path, 'rb') as f:
+            for line in f:
+                try:
+                    view, image, offset, count, digest = json.loads(line)
+                except ValueError:
+                    break
+                if not line.endswith(b'\n') or offset + count > data_rows:
+                    break
+                self.index[(view, image)] = (offset, count, digest)
+                self._data_end = max(self._data_end, offset + count)
+                self._index_end += len(line)
+
+    def _open_writers(self):
+        # Called with the lock held
+        for path, end in ((self.data_path, self._data_end * ROW_BYTES), (self.index_path, self._index_end)):
+            with open(path, 'ab') as f:
+                f.truncate(end)
+        self._writer = open(self.data_path, 'ab')
+        self._index_writer = open(self.index_path, 'ab')
+
+    def append(self, image, view, coordinates):
+        """Add one image's (N, 4) coordinates, returns the rows' sha256"""
+        rows = np.ascontiguousarray(np.asarray(coordinates, dtype=ROW_DTYPE).reshape(-1, ROW_FIELDS))
+        payload = rows.tobytes()
+        digest = hashlib.sha256(payload).hexdigest()
+        os.makedirs(os.path.dirname(os.path.abspath(self.data_path)), exist_ok=True)
+        with self.lock:
+            if self._writer is None:
+                self._open_writers()
+            offset = self._data_end
+            self._writer.write(payload)
+            self._writer.flush()
+            line = (json.dumps([view, image, offset, len(rows), digest]) + '\n').encode()
+            self._index_writer.write(line)
+            self._index_writer.flush()
+            self.index[(view, image)] = (offset, len(rows), digest)
+            self._data_end += len(rows)
+            self._index_end += len(line)
+        return digest
+
+    def __contains__(self, key):
+        return key in self.index
+
+    def images(self, view):
+        return [image for v, image in self.index if v == view]
+
+    def digest(self, image, view):
+        entry = self.index.get((view, image))
+        return entry[2] if entry else None
+
+    def get(self, image, view):
+        """(N, 4) coordinates of an image, or None when it has no entry"""
+        entry = self.index.get((view, image))
+        if entry is None:
+            return None
+        offset, count, _ = entry
+        with self.lock:
+            if self._reader is None:
+                # Unbuffered, so rows appended after the first read are never served from a stale buffer
+                self._reader = open(self.data_path, 'rb', buffering=0)
+            self._reader.seek(offset * ROW_BYTES)
+            payload = self._reader.read(count * ROW_BYTES)
+        return np.frombuffer(payload, dtype=ROW_DTYPE).reshape(count, ROW_FIELDS).astype(np.float64)
+
+    def compact(self):
+        """Rewrite both files with only the latest rows of every image"""
+        entries = sorted(self.index.items(), key=lambda item: item[1][0])
+        rows = {key: self.get(key[1], key[0]) for key, _ in entries}
+        with self.lock:
+            self.close()
+            tmp_data, tmp_index = self.data_path + '.tmp', self.index_path + '.tmp'
+            offset = 0
+            with open(tmp_data, 'wb') as data_file, open(tmp_index, 'w', newline='\n') as index_file:
+                for (view, image), (_, count, digest) in entries:
+                    data_file.write(rows[(view, image)].astype(ROW_DTYPE).tobytes())
+                    index_file.write(json.dumps([view, image, offset, count, digest]) + '\n')
+                    offset += count
+            os.replace(tmp_data, self.data_path)
+            os.replace(tmp_index, self.index_path)
+            self.index = {}
+            self._load_index()
+
+    def superseded_fraction(self):
+        """Fraction of the rows in the data file that no index entry points to any more"""
+        with self.lock:
+            live = sum(count for _, count, _ in self.index.values())
+            total = self._data_end
+        return (total - live) / total if total else 0.0
+
+    def maybe_compact(self, threshold=COMPACT_THRESHOLD):
+        """Compact when at least threshold of the rows are superseded (0 never does); returns whether it did"""
+        if threshold <= 0 or self.superseded_fraction() < threshold:
+            return False
+        self.compact()
+        return True
+
+    def close(self):
+        for handle in (self._reader, self._writer, self._index_writer):
+            if handle is not None:
+                handle.close()
+        self._reader = self._writer = self._index_writer = None
+
+
+def open_table(path):
+    """Shared DetectionTable for a path, so all stages of a process append through one instance"""
+    path = os.path.abspath(path)
+    with _tables_lock:
+        if path not in _tables:
+            _tables[path] = DetectionTable(path)
+        return _tables[path]
+
+
+def table_from_config(config):
+    """The run's DetectionTable when detection_output is "table", otherwise None"""
+    if config.get('detection_output', 'files') != 'table':
+        return None
+    return open_table(os.path.join(config['major_folder'],
+                                   config['paths'].get('detection_table', 'advanced/asbuilt_coordinates/detections')))
+
+
+def compact_from_config(table, config):
+    """End of a run: compact the table when its superseded share reaches detection_table_compact"""
+    if table is None:
+        return False
+    fraction = table.superseded_fraction()
+    if not table.maybe_compact(config.get('detection_table_compact', COMPACT_THRESHOLD)):
+        return False
+    print(f"Compacted {table.data_path}: dropped {fraction:.0%} superseded rows")
+    return True
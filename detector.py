@@ -0,0 +1,196 @@
+import os
+import sys
+import numpy as np
+from image_pipeline import ImageBatchLoader, decode_ahead, letterbox_into
+
+
+def tile_starts(length, tile, stride):
+    if length <= tile:
+        return [0]
+    return list(range(0, length - tile, stride)) + [length - tile]
+
+
+def tile_grid(height, width, tile_size, overlap=0.2, full_image=True):
+    """Overlapping (x0, y0, x1, y1) tiles covering an image, optionally preceded by the whole image"""
+    stride = max(1, int(tile_size * (1 - overlap)))
+    tiles = [(0, 0, width, height)] if full_image else []
+    for y0 in tile_starts(height, tile_size, stride):
+        for x0 in tile_starts(width, tile_size, stride):
+            tiles.append((x0, y0, min(x0 + tile_size, width), min(y0 + tile_size, height)))
+    if full_image and len(tiles) == 2:
+        # The image fits in one tile
+        tiles = tiles[:1]
+    return tiles
+
+
+class ColumnDetector:
+    """YOLOv5 column detector that keeps the weights loaded between calls"""
+
+    def __init__(self, model_path, yolov5_dir=None, device='cpu', conf_thres=0.5, iou_thres=0.45,
+                 img_size=640, batch_size=8, max_det=1000, decode_workers=None, prefetch=2,
+                 tile_size=None, tile_overlap=0.2, tile_full_image=True, tile_merge_thres=0.6):
+        # The YOLOv5 repository cloned by setup.py provides the model code
+        if yolov5_dir is None:
+            yolov5_dir = os.path.join(os.getcwd(), "yolov5")
+        if not os.path.exists(yolov5_dir):
+            raise FileNotFoundError(f"YOLOv5 repository not found: {yolov5_dir}")
+        if yolov5_dir not in sys.path:
+            sys.path.insert(0, yolov5_dir)
+
+        import torch
+        import torchvision
+        from models.common import DetectMultiBackend
+        from utils.general import check_img_size, non_max_suppression, scale_boxes
+        from utils.torch_utils import select_device
+
+        self.torch = torch
+        self.torchvision = torchvision
+        self.non_max_suppression = non_max_suppression
+        self.scale_boxes = scale_boxes
+
+        self.model_path = model_path
+        self.conf_thres = conf_thres
+        self.iou_thres = iou_thres
+        self.batch_size = batch_size
+        self.max_det = max_det
+        self.decode_workers = decode_workers
+        self.prefetch = prefetch
+
+        # Tiled mode: cut each photo into overlapping tile_size pixel tiles so slender
+        # columns keep their native resolution, plus the whole image for columns spanning tiles
+        self.tile_size = tile_size
+        self.tile_overlap = tile_overlap
+        self.tile_full_image = tile_full_image
+        self.tile_merge_thres = tile_merge_thres
+
+        # Load the weights once; every later call reuses this model
+        self.model = DetectMultiBackend(model_path, device=select_device(device))
+        self.stride = int(self.model.stride)
+        self.img_size = check_img_size(img_size, s=self.stride)
+        self.model.warmup(imgsz=(1, 3, self.img_size, self.img_size))
+
+    def predict(self, batch):
+        """Run the model and NMS on a letterboxed uint8 batch, returns the input tensor and
+        per-image (n, 6) x1, y1, x2, y2, conf, cls detections in letterbox pixels"""
+        torch = self.torch
+        im = torch.from_numpy(batch).to(self.model.device)
+        im = im.half() if self.model.fp16 else im.float()
+        im /= 255
+
+        with torch.no_grad():
+            pred = self.model(im)
+        return im, self.non_max_suppression(pred, self.conf_thres, self.iou_thres, max_det=self.max_det)
+
+    @staticmethod
+    def to_labels(xyxy, cls, h, w):
+        # Same rounding and normalization as detect.py --save-txt: (class, x, y, w, h)
+        xyxy = xyxy.round().cpu().numpy()
+        out = np.empty((len(xyxy), 5), dtype=np.float32)
+        out[:, 0] = cls.cpu().numpy()
+        out[:, 1] = (xyxy[:, 0] + xyxy[:, 2]) / 2 / w
+        out[:, 2] = (xyxy[:, 1] + xyxy[:, 3]) / 2 / h
+        out[:, 3] = (xyxy[:, 2] - xyxy[:, 0]) / w
+        out[:, 4] = (xyxy[:, 3] - xyxy[:, 1]) / h
+        return out
+
+    def infer(self, batch, shapes):
+        """Run the model on a letterboxed uint8 batch and return normalized labels per image"""
+        im, pred = self.predict(batch)
+        labels = []
+        for det, (h, w) in zip(pred, shapes):
+            if len(det) == 0:
+                labels.append(np.zeros((0, 5), dtype=np.float32))
+                continue
+            labels.append(self.to_labels(self.scale_boxes(im.shape[2:], det[:, :4], (h, w)), det[:, 5], h, w))
+        return labels
+
+    def merge_tiles(self, det):
+        """Merge an image's detections from all of its tiles, in full-image pixels.
+
+        Cross-tile NMS drops duplicates, then every kept box is fused with the boxes of its
+        class that lie mostly inside it or contain it (intersection over the smaller box), taking
+        their enclosing box, so a column cut at a tile border is restored from its pieces.
+        """
+        torch, ops = self.torch, self.torchvision.ops
+        if len(det) == 0:
+            return det
+        boxes, cls = det[:, :4], det[:, 5]
+        kept = det[ops.batched_nms(boxes, det[:, 4], cls, self.iou_thres)]
+
+        lt = torch.max(kept[:, None, :2], boxes[None, :, :2])
+        rb = torch.min(kept[:, None, 2:4], boxes[None, :, 2:4])
+        inter = (rb - lt).clamp(min=0).prod(2)
+        area = (boxes[:, 2:] - boxes[:, :2]).prod(1)
+        kept_area = (kept[:, 2:4] - kept[:, :2]).prod(1)
+        ios = inter / torch.min(kept_area[:, None], area[None]).clamp(min=1e-9)
+        group = (ios > self.tile_merge_thres) & (kept[:, None, 5] == cls[None])   # (K, N), includes itself
+
+        inf = torch.tensor(float('inf'), device=det.device, dtype=det.dtype)
+        top_left = torch.where(group[..., None], boxes[None, :, :2], inf).amin(1)
+        bottom_right = torch.where(group[..., None], boxes[None, :, 2:], -inf).amax(1)
+        fused = torch.cat([top_left, bottom_right, kept[:, 4:6]], 1)
+
+        # Pieces of the same column fuse to the same box; keep one
+        keep = ops.batched_nms(fused[:, :4], fused[:, 4], fused[:, 5], self.iou_thres)[:self.max_det]
+        return fused[keep]
+
+    def _run_tiles(self, batch, slots, images):
+        im, pred = self.predict(batch)
+        for (key, (x0, y0, x1, y1)), det in zip(slots, pred):
+            image = images[key]
+            if len(det):
+                det = det.clone()
+                det[:, :4] = self.scale_boxes(im.shape[2:], det[:, :4], (y1 - y0, x1 - x0))
+                det[:, [0, 2]] += x0
+                det[:, [1, 3]] += y0
+                image['detections'].append(det)
+            image['tiles_left'] -= 1
+            if image['tiles_left'] == 0:
+                del images[key]
+                h, w = image['shape']
+                det = self.torch.cat(image['detections']) if image['detections'] else None
+                det = self.merge_tiles(det) if det is not None else None
+                if det is None or len(det) == 0:
+                    labels = np.zeros((0, 5), dtype=np.float32)
+                else:
+                    labels = self.to_labels(det[:, :4], det[:, 5], h, w)
+                yield image['path'], labels, (h, w), image['img']
+
+    def detect_tiled_iter(self, image_paths, keep_original=False):
+        """Tiled detect_iter: tiles of every image are batched through the model together and
+        each image is yielded once all of its tiles are merged"""
+        size = self.img_size
+        batch = np.empty((self.batch_size, 3, size, size), dtype=np.uint8)
+        slots, images = [], {}
+        for key, (path, img0) in enumerate(decode_ahead(image_paths, self.decode_workers, self.prefetch)):
+            if img0 is None:
+                print(f"Warning: Could not read image {path}. Skipping.")
+                continue
+            h, w = img0.shape[:2]
+            tiles = tile_grid(h, w, self.tile_size, self.tile_overlap, self.tile_full_image)
+            images[key] = {'path': path, 'shape': (h, w), 'img': img0 if keep_original else None,
+                           'tiles_left': len(tiles), 'detections': []}
+            for x0, y0, x1, y1 in tiles:
+                letterbox_into(img0[y0:y1, x0:x1], batch[len(slots)])
+                slots.append((key, (x0, y0, x1, y1)))
+                if len(slots) == self.batch_size:
+                    yield from self._run_tiles(batch, slots, images)
+                    slots = []
+        if slots:
+            yield from self._run_tiles(batch[:len(slots)], slots, images)
+
+    def detect_iter(self, image_paths, keep_original=False):
+        """Yield (image_path, labels, (height, width), original image) as batches finish"""
+        if self.tile_size:
+            yield from self.detect_tiled_iter(image_paths, keep_original)
+            return
+        loader = ImageBatchLoader(image_paths, img_size=self.img_size, batch_size=self.batch_size,
+                                  workers=self.decode_workers, prefetch=self.prefetch,
+                                  keep_original=keep_original)
+        for paths, batch, shapes, originals in loader:
+            labels = self.infer(batch, shapes)
+            yield from zip(paths, labels, shapes, originals)
+
+    def detect(self, image_paths):
+        """Detect columns in a list of images, returns {image_path: (K, 5) array}"""
+        return {path: labels for path, labels, _, _ in self.detect_iter(image_paths)}
@@ -0,0 +1,83 @@
+import os
+import hashlib
+import numpy as np
+from facades import LEVEL, view_vectors
+
+
+class ColumnIndex:
+    """Per-storey visibility index over column plan positions.
+
+    For a viewing plane at a bearing, every storey's columns are swept in lanes across the
+    facade: within each lane the column closest to the viewer is visible, together with any
+    column within `depth_tolerance` of it. Unlike picking the columns on the global extreme,
+    this also finds setbacks, the inner legs of L-shaped plans and curved facades.
+    Results are cached per (model hash, bearing) in memory and, with cache_dir, on disk.
+    """
+
+    def __init__(self, columns, lane_width=None, depth_tolerance=0.0, cache_dir=None):
+        self.columns = np.ascontiguousarray(columns, dtype=np.float64)
+        self.model_hash = hashlib.sha256(self.columns.tobytes()).hexdigest()
+        self.depth_tolerance = depth_tolerance
+        self.cache_dir = cache_dir
+        self._cache = {}
+
+        # Storeys are built once: column order grouped by level
+        self.levels, self.storey = np.unique(self.columns[:, LEVEL], return_inverse=True)
+
+        if lane_width is None:
+            lane_width = self.default_lane_width()
+        self.lane_width = lane_width
+
+    def default_lane_width(self):
+        # Half the typical spacing between distinct column lines, measured along both plan axes
+        gaps = []
+        for axis in (0, 1):
+            values = np.unique(self.columns[:, axis])
+            diffs = np.diff(values)
+            gaps.append(diffs[diffs > 0])
+        gaps = np.concatenate(gaps)
+        return float(np.median(gaps)) / 2 if len(gaps) else 1.0
+
+    def _cache_file(self, key):
+        name = hashlib.sha256(repr(key).encode()).hexdigest()[:32]
+        return os.path.join(self.cache_dir, f"visible_{name}.npy")
+
+    def visible(self, bearing):
+        """Boolean mask of the columns visible from a viewing plane facing `bearing`"""
+        key = (self.model_hash, float(bearing), self.lane_width, self.depth_tolerance)
+        if key in self._cache:
+            return self._cache[key]
+
+        path = self._cache_file(key) if self.cache_dir else None
+        if path and os.path.exists(path):
+            mask = np.load(path)
+        else:
+            mask = self._sweep(bearing)
+            if path:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                np.save(path, mask)
+        self._cache[key] = mask
+        return mask
+
+    def _sweep(self, bearing):
+        mask = np.zeros(len(self.columns), dtype=bool)
+        if len(self.columns) == 0:
+            return mask
+        normal, tangent, _ = view_vectors(bearing)
+        plan = self.columns[:, :2]
+        depth = plan @ normal      # larger is closer to the viewer
+        across = plan @ tangent
+        lane = np.round((across - across.min()) / self.lane_width).astype(np.int64)
+
+        # Sort by storey, lane and descending depth: the first entry of each group is the closest
+        order = np.lexsort((-depth, lane, self.storey))
+        group_key = self.storey[order] * (lane.max() + 1) + lane[order]
+        starts = np.flatnonzero(np.r_[True, group_key[1:] != group_key[:-1]])
+        group_front = np.repeat(depth[order][starts], np.diff(np.r_[starts, len(order)]))
+
+        mask[order] = depth[order] >= group_front - self.depth_tolerance
+        return mask
+
+    def visible_columns(self, bearing):
+        """Columns visible from `bearing`, as rows of the (N, 5) column array"""
+        return self.columns[self.visible(bearing)]
@@ -0,0 +1,70 @@
+import numpy as np
+
+# Columns are (N, 5) float arrays: x, y, ztop, zbot, level (plan x is east, plan y is north)
+X, Y, ZTOP, ZBOT, LEVEL = range(5)
+
+# Per named view: outward facade normal in plan, the plan direction that runs left to right
+# in the elevation, and whether the elevation's horizontal axis starts at the facade minimum
+VIEW_TRANSFORMS = {
+    'east':  ((1.0, 0.0),  (0.0, 1.0),  False),   # x' = y
+    'west':  ((-1.0, 0.0), (0.0, -1.0), True),    # x' = ymax - y
+    'north': ((0.0, 1.0),  (-1.0, 0.0), True),    # x' = xmax - x
+    'south': ((0.0, -1.0), (1.0, 0.0),  False),   # x' = x
+}
+VIEWS = tuple(VIEW_TRANSFORMS)
+
+
+def view_vectors(view):
+    """Return (normal, tangent, from_min) for a named view or a compass bearing in degrees.
+
+    A bearing is the direction the facade faces (0 = north, 90 = east); the viewer stands on
+    that side looking back at the building. Bearings always measure x' from the facade minimum.
+    """
+    if isinstance(view, str):
+        if view not in VIEW_TRANSFORMS:
+            raise ValueError(f"Invalid view direction: {view}. Use 'east', 'west', 'north', 'south' or a bearing.")
+        normal, tangent, from_min = VIEW_TRANSFORMS[view]
+        return np.array(normal), np.array(tangent), from_min
+
+    theta = np.radians(float(view))
+    # Round away the sin/cos noise so that cardinal bearings select exactly like named views
+    normal = np.round(np.array([np.sin(theta), np.cos(theta)]), 12)
+    tangent = np.array([-normal[1], normal[0]])
+    return normal, tangent, True
+
+
+def select_facades(columns, views=VIEWS, tolerance=0.0):
+    """Return {view: boolean mask} of the outermost columns for every view in one pass.
+
+    A column belongs to a facade when its distance along the facade normal is within
+    `tolerance` of the outermost column's.
+    """
+    columns = np.asarray(columns, dtype=np.float64)
+    if len(columns) == 0:
+        return {view: np.zeros(0, dtype=bool) for view in views}
+    normals = np.array([view_vectors(view)[0] for view in views])   # (V, 2)
+    depth = columns[:, :2] @ normals.T                              # (N, V)
+    masks = depth >= depth.max(axis=0) - tolerance
+    return {view: masks[:, i] for i, view in enumerate(views)}
+
+
+def to_elevation(facade_columns, view):
+    """Transform facade columns from plan to the view's elevation: (M, 5) of xt, yt, xb, yb, level"""
+    facade_columns = np.asarray(facade_columns, dtype=np.float64)
+    _, tangent, from_min = view_vectors(view)
+    axis = np.flatnonzero(tangent)
+    if len(axis) == 1:
+        # Axis-aligned: scale the one coordinate, so a -0.0 stays -0.0 as the per-view loops wrote it
+        u = facade_columns[:, axis[0]] * tangent[axis[0]]
+    else:
+        u = facade_columns[:, :2] @ tangent
+    if from_min and len(u):
+        u = u - u.min()
+    return np.column_stack([u, facade_columns[:, ZTOP], u, facade_columns[:, ZBOT], facade_columns[:, LEVEL]])
+
+
+def facade_elevations(columns, views=VIEWS, tolerance=0.0):
+    """Select every view's facade and transform it to elevation coordinates, {view: (M, 5)}"""
+    columns = np.asarray(columns, dtype=np.float64)
+    masks = select_facades(columns, views, tolerance)
+    return {view: to_elevation(columns[masks[view]], view) for view in views}
@@ -0,0 +1,57 @@
+import os
+import json
+import hashlib
+import numpy as np
+
+# Bump when the layout of the cached column table changes
+CACHE_VERSION = 1
+
+# Per-column arrays stored in the cache; verts are flattened with per-column offsets
+COLUMN_FIELDS = ('ifc_id', 'name', 'global_id', 'level', 'matrix', 'relative', 'ztop', 'zbot',
+                 'verts', 'verts_offsets')
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    """Hash a file's content in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cache_key(file_hash, settings):
+    """Combine the IFC content hash with everything that affects the extracted geometry"""
+    payload = json.dumps({'file': file_hash, 'settings': settings, 'version': CACHE_VERSION}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def cache_path(cache_dir, key):
+    return os.path.join(cache_dir, f"columns_{key[:32]}.npz")
+
+
+def save_columns(path, table):
+    """Write a column table as one uncompressed .npz, atomically"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, **{field: table[field] for field in COLUMN_FIELDS})
+    os.replace(tmp_path, path)
+
+
+def load_columns(path):
+    """Load a cached column table, or None when it is missing or unreadable"""
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            return {field: data[field] for field in COLUMN_FIELDS}
+    except (OSError, KeyError, ValueError) as e:
+        print(f"Warning: Ignoring unreadable IFC cache {path}: {e}")
+        return None
+
+
+def column_verts(table, i):
+    """Flat vertex list of column i"""
+    offsets = table['verts_offsets']
+    return table['verts'][offsets[i]:offsets[i + 1]]
@@ -0,0 +1,132 @@
+import os
+import struct
+from functools import lru_cache
+
+# JPEG start-of-frame markers carrying the image dimensions
+SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+EXIF_ORIENTATION_TAG = 0x0112
+
+
+def parse_exif_orientation(tiff):
+    """Read the orientation tag from a TIFF-structured EXIF block, 1 when absent"""
+    if len(tiff) < 8:
+        return 1
+    if tiff[:2] == b'II':
+        endian = '<'
+    elif tiff[:2] == b'MM':
+        endian = '>'
+    else:
+        return 1
+    ifd_offset = struct.unpack(endian + 'I', tiff[4:8])[0]
+    if ifd_offset + 2 > len(tiff):
+        return 1
+    count = struct.unpack(endian + 'H', tiff[ifd_offset:ifd_offset + 2])[0]
+    for i in range(count):
+        entry = ifd_offset + 2 + 12 * i
+        if entry + 12 > len(tiff):
+            break
+        tag, field_type = struct.unpack(endian + 'HH', tiff[entry:entry + 4])
+        if tag == EXIF_ORIENTATION_TAG and field_type == 3:  # SHORT
+            orientation = struct.unpack(endian + 'H', tiff[entry + 8:entry + 10])[0]
+            return orientation if 1 <= orientation <= 8 else 1
+    return 1
+
+
+def _read_exact(f, size):
+    """Read size bytes, raising ValueError when the file ends first"""
+    data = f.read(size)
+    if len(data) < size:
+        raise ValueError("Truncated image header")
+    return data
+
+
+def probe_jpeg(f):
+    width = height = None
+    orientation = 1
+    f.seek(2)
+    while True:
+        byte = f.read(1)
+        while byte and byte != b'\xff':
+            byte = f.read(1)
+        while byte == b'\xff':  # fill bytes
+            byte = f.read(1)
+        if not byte:
+            break
+        marker = byte[0]
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:  # markers without a length
+            continue
+        if marker in (0xD9, 0xDA):  # end of image or start of scan: pixels follow
+            break
+        length = struct.unpack('>H', _read_exact(f, 2))[0]
+        if length < 2:
+            raise ValueError("Invalid JPEG segment length")
+        segment = _read_exact(f, length - 2)
+        if marker == 0xE1 and segment[:6] == b'Exif\x00\x00':
+            orientation = parse_exif_orientation(segment[6:])
+        elif marker in SOF_MARKERS:
+            if len(segment) < 5:
+                raise ValueError("Truncated JPEG frame header")
+            height, width = struct.unpack('>HH', segment[1:5])
+            break
+    if width is None:
+        raise ValueError("No JPEG frame header found")
+    return width, height, orientation
+
+
+def probe_png(f):
+    f.seek(8)
+    length, chunk_type = struct.unpack('>I4s', _read_exact(f, 8))
+    if chunk_type != b'IHDR':
+        raise ValueError("PNG without IHDR chunk")
+    width, height = struct.unpack('>II', _read_exact(f, 8))
+    f.seek(length - 8 + 4, os.SEEK_CUR)  # rest of IHDR and its CRC
+
+    # Orientation can only come from an eXIf chunk placed before the image data
+    orientation = 1
+    while True:
+        header = f.read(8)
+        if len(header) < 8:
+            break
+        length, chunk_type = struct.unpack('>I4s', header)
+        if chunk_type in (b'IDAT', b'IEND'):
+            break
+        if chunk_type == b'eXIf':
+            orientation = parse_exif_orientation(f.read(length))
+            break
+        f.seek(length + 4, os.SEEK_CUR)
+    return width, height, orientation
+
+
+@lru_cache(maxsize=8192)
+def _probe_cached(image_path, mtime_ns, size):
+    with open(image_path, 'rb') as f:
+        head = f.read(8)
+        if head[:2] == b'\xff\xd8':
+            return probe_jpeg(f)
+        if head == PNG_SIGNATURE:
+            return probe_png(f)
+
+    # Other formats: PIL only parses the header until pixels are requested
+    from PIL import Image
+    with Image.open(image_path) as img:
+        width, height = img.size
+        orientation = img.getexif().get(EXIF_ORIENTATION_TAG, 1)
+    return width, height, orientation
+
+
+def probe_image(image_path):
+    """Return (width, height, exif_orientation) of the stored image without decoding pixels.
+
+    Results are cached per (path, mtime, size), so a file that changes on disk is probed again.
+    """
+    st = os.stat(image_path)
+    return _probe_cached(os.path.abspath(image_path), st.st_mtime_ns, st.st_size)
+
+
+def image_size(image_path):
+    """Return the displayed (width, height), with EXIF rotation applied as cv.imread does"""
+    width, height, orientation = probe_image(image_path)
+    if orientation in (5, 6, 7, 8):  # rotated by 90 or 270 degrees
+        return height, width
+    return width, height
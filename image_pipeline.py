@@ -0,0 +1,153 @@
+import os
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import cv2 as cv
+from image_meta import image_size
+
+# libjpeg can decode JPEGs directly at 1/2, 1/4 or 1/8 scale
+REDUCED_DECODE_FLAGS = ((8, cv.IMREAD_REDUCED_COLOR_8), (4, cv.IMREAD_REDUCED_COLOR_4), (2, cv.IMREAD_REDUCED_COLOR_2))
+
+
+def letterbox_into(img0, out, pad_value=114):
+    """Resize and pad a BGR image into a preallocated (3, S, S) RGB slot, YOLOv5 letterbox style"""
+    size = out.shape[1]
+    h, w = img0.shape[:2]
+    r = min(size / h, size / w)
+    new_w, new_h = int(round(w * r)), int(round(h * r))
+    dw, dh = (size - new_w) / 2, (size - new_h) / 2
+    top, left = int(round(dh - 0.1)), int(round(dw - 0.1))
+
+    if (w, h) != (new_w, new_h):
+        img0 = cv.resize(img0, (new_w, new_h), interpolation=cv.INTER_LINEAR)
+
+    out[...] = pad_value
+    out[:, top:top + new_h, left:left + new_w] = img0[:, :, ::-1].transpose(2, 0, 1)  # BGR HWC to RGB CHW
+
+
+def decode_ahead(image_paths, workers=None, prefetch=2):
+    """Yield (path, full-resolution BGR image or None) with decodes on a thread pool,
+    at most `prefetch` images ahead of the consumer"""
+    with ThreadPoolExecutor(max_workers=workers or min(8, os.cpu_count() or 1)) as pool:
+        pending = deque()
+        paths = iter(image_paths)
+        for path in paths:
+            pending.append((path, pool.submit(cv.imread, path)))
+            if len(pending) > prefetch:
+                break
+        while pending:
+            path, future = pending.popleft()
+            next_path = next(paths, None)
+            if next_path is not None:
+                pending.append((next_path, pool.submit(cv.imread, next_path)))
+            yield path, future.result()
+
+
+class ImageBatchLoader:
+    """Decode and letterbox images on a thread pool into preallocated batches.
+
+    Iterating yields (paths, batch, shapes, originals) where batch is a (B, 3, S, S) uint8
+    view into a reused buffer, shapes holds the original (height, width) per image and
+    originals holds the decoded BGR images (or None when keep_original is False, in which
+    case large JPEGs are decoded at reduced scale and shapes come from the file header).
+    A batch buffer is handed back to the decoder once the next batch is requested,
+    so at most `prefetch` batches are decoded ahead of the consumer.
+    """
+
+    def __init__(self, image_paths, img_size=640, batch_size=8, workers=None, prefetch=2, keep_original=True):
+        self.image_paths = list(image_paths)
+        self.img_size = img_size
+        self.batch_size = batch_size
+        self.workers = workers or min(8, os.cpu_count() or 1)
+        self.prefetch = max(1, prefetch)
+        self.keep_original = keep_original
+
+    def _decode(self, image_path, out):
+        if self.keep_original:
+            img0 = cv.imread(image_path)
+            if img0 is None:
+                return None, None
+            letterbox_into(img0, out)
+            return img0.shape[:2], img0
+
+        # Without the full-resolution pixels we only need enough of them for the letterbox:
+        # the header gives the original size, and large JPEGs are decoded at reduced scale
+        try:
+            width, height = image_size(image_path)
+        except (OSError, ValueError):
+            return None, None
+        flag = cv.IMREAD_COLOR
+        if image_path.lower().endswith(('.jpg', '.jpeg')):
+            for factor, reduced_flag in REDUCED_DECODE_FLAGS:
+                if max(width, height) // factor >= self.img_size:
+                    flag = reduced_flag
+                    break
+        img0 = cv.imread(image_path, flag)
+        if img0 is None:
+            return None, None
+        letterbox_into(img0, out)
+        return (height, width), None
+
+    def _produce(self, pool, free, ready, stop):
+        try:
+            for start in range(0, len(self.image_paths), self.batch_size):
+                chunk = self.image_paths[start:start + self.batch_size]
+                buf = free.get()
+                if stop.is_set():
+                    return
+                futures = [pool.submit(self._decode, path, buf[i]) for i, path in enumerate(chunk)]
+
+                paths, shapes, originals, slots = [], [], [], []
+                for i, (path, future) in enumerate(zip(chunk, futures)):
+                    shape, img0 = future.result()
+                    if shape is None:
+                        print(f"Warning: Could not read image {path}. Skipping.")
+                        continue
+                    paths.append(path)
+                    shapes.append(shape)
+                    originals.append(img0)
+                    slots.append(i)
+
+                # Compact the batch when unreadable images left gaps
+                if slots != list(range(len(slots))):
+                    for dst, src in enumerate(slots):
+                        buf[dst] = buf[src]
+                ready.put((buf, paths, shapes, originals))
+        except Exception as e:
+            ready.put(e)
+        finally:
+            ready.put(None)
+
+    def __iter__(self):
+        free = queue.Queue()
+        for _ in range(self.prefetch + 1):
+            free.put(np.empty((self.batch_size, 3, self.img_size, self.img_size), dtype=np.uint8))
+        ready = queue.Queue(maxsize=self.prefetch)
+        stop = threading.Event()
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            producer = threading.Thread(target=self._produce, args=(pool, free, ready, stop), daemon=True)
+            producer.start()
+            try:
+                while True:
+                    item = ready.get()
+                    if item is None:
+                        break
+                    if isinstance(item, Exception):
+                        raise item
+                    buf, paths, shapes, originals = item
+                    if paths:
+                        yield paths, buf[:len(paths)], shapes, originals
+                    free.put(buf)
+            finally:
+                # Unblock the producer if the consumer stopped early
+                stop.set()
+                free.put(None)
+                while producer.is_alive():
+                    try:
+                        ready.get(timeout=0.1)
+                    except queue.Empty:
+                        pass
+                producer.join()
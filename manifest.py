@@ -0,0 +1,78 @@
+import os
+import json
+import hashlib
+import threading
+
+MANIFEST_VERSION = 1
+
+
+def hash_values(values):
+    """Stable hash of JSON-serializable settings, e.g. the config keys a stage depends on"""
+    return hashlib.sha256(json.dumps(values, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class RunManifest:
+    """Input hashes and outputs of every stage and artifact, used to skip unchanged work.
+
+    Entries are keyed by (stage, key), e.g. ('detect', image name). A stage is fresh when the
+    inputs recorded last time equal the current ones and all recorded outputs still exist.
+    File hashes are remembered with the file's mtime and size, so unchanged files are not
+    re-read on the next run.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.files = {}
+        self.stages = {}
+        if os.path.exists(path):
+            try:
+                with open(path, 'r') as f:
+                    data = json.load(f)
+                if data.get('version') == MANIFEST_VERSION:
+                    self.files = data.get('files', {})
+                    self.stages = data.get('stages', {})
+            except (OSError, ValueError) as e:
+                print(f"Warning: Ignoring unreadable run manifest {path}: {e}")
+
+    def file_hash(self, path):
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        stamp = [st.st_mtime_ns, st.st_size]
+        with self.lock:
+            cached = self.files.get(path)
+        if cached and cached[:2] == stamp:
+            return cached[2]
+
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+        with self.lock:
+            self.files[path] = stamp + [digest.hexdigest()]
+        return digest.hexdigest()
+
+    def is_fresh(self, stage, key, inputs):
+        with self.lock:
+            entry = self.stages.get(stage, {}).get(key)
+        if entry is None or entry['inputs'] != inputs:
+            return False
+        return all(os.path.exists(output) for output in entry['outputs'])
+
+    def record(self, stage, key, inputs, outputs):
+        with self.lock:
+            self.stages.setdefault(stage, {})[key] = {'inputs': inputs, 'outputs': list(outputs)}
+
+    def outputs(self, stage, key):
+        with self.lock:
+            entry = self.stages.get(stage, {}).get(key)
+        return entry['outputs'] if entry else []
+
+    def save(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with self.lock:
+            data = {'version': MANIFEST_VERSION, 'files': self.files, 'stages': self.stages}
+            with open(tmp_path, 'w') as f:
+                json.dump(data, f)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,191 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import yaml
+import asplanned
+import asbuilt
+import FloorRec_multi
+import progress_multi
+from facades import LEVEL
+from artifacts import writer_from_config
+from detection_table import table_from_config, compact_from_config
+from overlay import overlay_settings
+from progress_store import store_from_config
+
+VIEWS = tuple(asplanned.VIEW_BEARINGS)
+
+def load_config(config_file="user.yaml"):
+    with open(config_file, 'r') as file:
+        config = yaml.safe_load(file)
+    return config
+
+def get_full_path(major_folder, relative_path):
+    return os.path.join(major_folder, relative_path)
+
+def multi_view_settings(config):
+    """Views of a multi-view run and their image folders, from the optional `multi_view` section.
+    A view's images default to the <view> subfolder of the as-built images folder."""
+    multi_view_config = config.get('multi_view') or {}
+    views = [str(view).strip().lower() for view in multi_view_config.get('views') or VIEWS]
+    for view in views:
+        if view not in VIEWS:
+            raise ValueError(f"Invalid view direction: {view}. Use one of: {', '.join(VIEWS)}.")
+
+    asbuilt_images = get_full_path(config['major_folder'], config['paths']['asbuilt_images'])
+    image_folders = multi_view_config.get('image_folders') or {}
+    folders = {view: get_full_path(config['major_folder'], image_folders[view]) if view in image_folders
+               else os.path.join(asbuilt_images, view) for view in views}
+    return views, folders
+
+def load_planned_views(config):
+    """Parse the IFC once and build every view's planned table together.
+
+    Returns the rounded (N, 5) plan columns, {view: facade mask over them} and {view: (M, 5)
+    elevation table}. The planned text files and the artifact planned table are written too.
+    """
+    major_folder = config['major_folder']
+    paths = config['paths']
+    column_table, masks, planned = asplanned.load_planned(config)
+    rounded_mixed = np.round(asplanned.columns_array(column_table), 2)
+
+    for view in VIEWS:
+        asplanned.save_to_file(get_full_path(major_folder, paths[f'{view}_txt_path']), planned[view])
+        print(f"number of {view.capitalize()} col:", len(planned[view]))
+    print("TOTAL number of Columns", len(rounded_mixed))
+    return rounded_mixed, masks, planned
+
+def detect_views(config, image_views, artifacts=None, detections=None):
+    """Detect the images of all views with one model, in shared batches, and convert each
+    image's labels into its view's output folder"""
+    overlay = overlay_settings(config)
+    workers = overlay['workers']
+    for view in set(image_views.values()):
+        os.makedirs(asbuilt.get_output_folder(config, view), exist_ok=True)
+
+    detector = asbuilt.create_detector(config)
+    images = detector.detect_iter(list(image_views), keep_original=overlay['mode'] != 'off')
+    jobs = ((image_path, labels, shape, img, asbuilt.get_output_folder(config, image_views[image_path]),
+             image_views[image_path], artifacts, detections, overlay) for image_path, labels, shape, img in images)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for _, future in asbuilt.submit_bounded(pool, asbuilt.convert_image, jobs, 2 * workers):
+            future.result()
+
+def view_fractions(results_by_view, views, length):
+    """(V, length) built fraction per view and floor: the best image of each view, capped at 1"""
+    fractions = np.zeros((len(views), length))
+    for i, view in enumerate(views):
+        for results in results_by_view.get(view, {}).values():
+            planned = results['asplanned_counts']
+            fraction = np.where(planned > 0, results['adjusted_asbuilt_counts'] / np.where(planned > 0, planned, 1), 0)
+            max_floor = results['max_floor']
+            fractions[i, :max_floor] = np.maximum(fractions[i, :max_floor], np.minimum(fraction, 1))
+    return fractions
+
+def fuse_views(levels, masks, fractions):
+    """Building-level planned and constructed columns per floor from several facades.
+
+    levels is each plan column's floor, masks the (V, N) facade membership of the columns and
+    fractions the (V, L) built fraction of every facade and floor. A column visible from two
+    facades (a corner) is counted once, as built by the larger fraction of its facades.
+    """
+    estimate = np.where(masks, fractions[:, levels], 0).max(axis=0)
+    seen = masks.any(axis=0)
+    length = fractions.shape[1]
+    planned = np.bincount(levels[seen], minlength=length)
+    constructed = np.bincount(levels[seen], weights=estimate[seen], minlength=length)
+    return planned, constructed
+
+def save_building_progress(output_file, views, planned, constructed, corners):
+    floors = np.flatnonzero(planned[1:] > 0) + 1
+    percentages = constructed / np.where(planned > 0, planned, 1) * 100
+    overall = float(np.mean(percentages[floors])) if len(floors) else 0.0
+
+    with open(output_file, 'w') as f:
+        f.write(f"Building progress from views: {', '.join(views)}\n")
+        f.write(f"Corner columns counted once: {corners}\n")
+        f.write("Floor, Constructed Percentage, Constructed Columns, Planned Columns\n")
+        for floor in floors.tolist():
+            f.write(f"{floor}, {percentages[floor]:.2f}%, {constructed[floor]:.1f}, {planned[floor]}\n")
+        f.write(f"\nOverall Building Progress: {overall:.2f}%\n")
+
+    print(f"\nBuilding progress from views: {', '.join(views)} ({corners} corner columns counted once)")
+    for floor in floors.tolist():
+        print(f"Floor {floor}: {percentages[floor]:.2f}% ({constructed[floor]:.1f}/{planned[floor]})")
+    print(f"Overall Building Progress: {overall:.2f}%")
+    print(f"Results saved to {output_file}")
+    return floors, percentages, overall
+
+def run_multi_view(config):
+    """Process every configured facade's images in one run and fuse them into building progress"""
+    major_folder = config['major_folder']
+    output_folder_base = get_full_path(major_folder, config['paths']['output_folder_base'])
+    views, folders = multi_view_settings(config)
+
+    artifacts = writer_from_config(config)
+    detections = table_from_config(config)
+    history = store_from_config(config)
+    columns, masks, planned = load_planned_views(config)
+    if artifacts is not None:
+        for view in VIEWS:
+            artifacts.add_rows('planned', planned[view], view=view)
+
+    image_views = {}
+    for view in views:
+        if not os.path.isdir(folders[view]):
+            print(f"Warning: No image folder for the {view} view ({folders[view]}). Skipping.")
+            continue
+        images = asbuilt.list_images(folders[view])
+        print(f"Found {len(images)} {view} images")
+        image_views.update((image_path, view) for image_path in images)
+
+    if image_views:
+        detect_views(config, image_views, artifacts, detections)
+    # Floor recognition workers may be separate processes that read the store from disk
+    if artifacts is not None:
+        artifacts.flush()
+
+    floor_settings = FloorRec_multi.floor_settings(config)
+    results_by_view = {}
+    for view in views:
+        images = [image_path for image_path, image_view in image_views.items() if image_view == view]
+        if not images:
+            continue
+        summary = FloorRec_multi.process_images(images, view, output_folder_base, config, artifacts, detections,
+                                                floor_settings)
+        FloorRec_multi.print_summary(summary)
+        floor_files = [entry['floor_file'] for entry in summary if entry['status'] == 'ok']
+        results_by_view[view] = progress_multi.process_floor_files(planned[view], floor_files, view,
+                                                                   output_folder_base, artifacts, history)
+    if history is not None:
+        history.close()
+    compact_from_config(detections, config)
+
+    covered = [view for view in views if results_by_view.get(view)]
+    if not covered:
+        print("No view produced progress results; no building progress to fuse.")
+        if artifacts is not None:
+            artifacts.flush()
+        return None
+
+    levels = columns[:, LEVEL].astype(int)
+    length = max([levels.max() + 1 if len(levels) else 1] +
+                 [results['max_floor'] for view in covered for results in results_by_view[view].values()])
+    view_masks = np.array([masks[view] for view in covered]).reshape(len(covered), len(columns))
+    fractions = view_fractions(results_by_view, covered, length)
+    planned_counts, constructed = fuse_views(levels, view_masks, fractions)
+    corners = int(np.sum(view_masks.sum(axis=0) > 1))
+
+    output_file = os.path.join(output_folder_base, "building_construction_percentage.txt")
+    floors, percentages, overall = save_building_progress(output_file, covered, planned_counts, constructed, corners)
+    if artifacts is not None:
+        rows = [[floor, planned_counts[floor], round(constructed[floor]), percentages[floor], overall]
+                for floor in floors.tolist()]
+        artifacts.add_rows('progress', rows, image='building', view='building')
+        artifacts.flush()
+    return overall
+
+def main():
+    run_multi_view(load_config())
+
+if __name__ == "__main__":
+    main()
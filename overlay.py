@@ -0,0 +1,56 @@
+import os
+
+OVERLAY_MODES = ('full', 'preview', 'off')
+WRITABLE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+# Defaults for the optional `overlay` section of user.yaml
+OVERLAY_DEFAULTS = {'mode': 'full', 'jpeg_quality': 90, 'preview_size': 1280, 'workers': 4}
+
+
+def overlay_settings(config):
+    settings = dict(OVERLAY_DEFAULTS, **(config.get('overlay') or {}))
+    if settings['mode'] not in OVERLAY_MODES:
+        raise ValueError(f"Unknown overlay mode: {settings['mode']}. Use one of: {', '.join(OVERLAY_MODES)}.")
+    return settings
+
+
+def draw_boxes(img, labels, color=(0, 0, 255), thickness=None):
+    """Draw normalized [cls, x, y, w, h] boxes into a BGR image in place"""
+    import cv2 as cv
+
+    height, width = img.shape[:2]
+    if thickness is None:
+        thickness = max(1, round(max(height, width) / 1000))
+    for data in labels:
+        x, y, w, h = map(float, data[1:5])
+        top_left = (int(round((x - w / 2) * width)), int(round((y - h / 2) * height)))
+        bottom_right = (int(round((x + w / 2) * width)), int(round((y + h / 2) * height)))
+        cv.rectangle(img, top_left, bottom_right, color, thickness, lineType=cv.LINE_AA)
+    return img
+
+
+def write_overlay(img, labels, save_path, mode='full', jpeg_quality=90, preview_size=1280, **_):
+    """Draw the detected boxes onto the decoded image and write it; returns the written path.
+
+    'full' draws into the image buffer itself and writes it at native resolution, 'preview'
+    draws into a copy downscaled to at most preview_size pixels on the long side, 'off' skips.
+    """
+    import cv2 as cv
+
+    if mode == 'off' or img is None:
+        return None
+    if mode == 'preview':
+        height, width = img.shape[:2]
+        scale = preview_size / max(height, width)
+        if scale < 1:
+            img = cv.resize(img, (int(round(width * scale)), int(round(height * scale))), interpolation=cv.INTER_AREA)
+
+    draw_boxes(img, labels)
+
+    root, ext = os.path.splitext(save_path)
+    if ext.lower() not in WRITABLE_EXTENSIONS:
+        save_path = root + '.jpg'
+    params = [cv.IMWRITE_JPEG_QUALITY, int(jpeg_quality)] if save_path.lower().endswith(('.jpg', '.jpeg')) else []
+    if not cv.imwrite(save_path, img, params):
+        raise OSError(f"Could not write overlay {save_path}")
+    return save_path
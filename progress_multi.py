@@ -2,6 +2,8 @@ import numpy as np
 import yaml
 import os
 import glob
+from artifacts import writer_from_config, field_array
+from progress_store import store_from_config
 
 def load_config(config_file="user.yaml"):
     with open(config_file, 'r') as file:
@@ -11,67 +13,196 @@ def load_config(config_file="user.yaml"):
 def get_full_path(major_folder, relative_path):
     return os.path.join(major_folder, relative_path)
 
-def process_single_comparison(asplanned_data, asbuilt_data, image_name):
-    # Extract floor numbers from both as-planned and as-built data
-    asplanned_floors = asplanned_data[:, -1].astype(int)
-    asbuilt_floors = asbuilt_data[:, -1].astype(int)
-
-    # Count columns per floor
-    asplanned_counts = np.bincount(asplanned_floors)
-    asbuilt_counts = np.bincount(asbuilt_floors)
-
-    # Ensure arrays are same length
-    max_floor = max(len(asplanned_counts), len(asbuilt_counts))
-    asplanned_counts = np.pad(asplanned_counts, (0, max_floor - len(asplanned_counts)), 'constant')
-    asbuilt_counts = np.pad(asbuilt_counts, (0, max_floor - len(asbuilt_counts)), 'constant')
-
-    # Calculate initial percentages
-    constructed_percentages = (asbuilt_counts / np.where(asplanned_counts > 0, asplanned_counts, 1)) * 100
-
-    # Sequence Consideration
-    adjusted_asbuilt_counts = asbuilt_counts.copy()
-    for floor in range(max_floor - 1, 0, -1):
-        if adjusted_asbuilt_counts[floor] > 0:
-            for lower_floor in range(1, floor):
-                if asplanned_counts[lower_floor] > 0:
-                    adjusted_asbuilt_counts[lower_floor] = asplanned_counts[lower_floor]
-
-    # Calculate adjusted percentages
-    adjusted_constructed_percentages = (adjusted_asbuilt_counts / np.where(asplanned_counts > 0, asplanned_counts, 1)) * 100
-
-    # Calculate overall progress
+def batch_progress(asplanned_floors, asbuilt_floors, image_ids, n_images):
+    """Progress of many images against one as-planned table in one vectorized pass.
+
+    asbuilt_floors holds the floor label of every as-built column of every image and
+    image_ids the image (0 to n_images - 1) each column belongs to. Returns the per-image
+    max_floor (n,), the planned counts (L,), and the (n, L) adjusted counts and percentages
+    and (n,) overall progress, all padded with zeros past each image's max_floor.
+    """
+    asplanned_floors = np.asarray(asplanned_floors).astype(int)
+    asbuilt_floors = np.asarray(asbuilt_floors).astype(int)
+    image_ids = np.asarray(image_ids).astype(int)
+
+    # Count columns per floor: one bincount over (image, floor) cells
+    planned_length = asplanned_floors.max() + 1 if len(asplanned_floors) else 0
+    built_length = np.zeros(n_images, dtype=int)
+    np.maximum.at(built_length, image_ids, asbuilt_floors + 1)
+    max_floor = np.maximum(built_length, planned_length)
+    length = int(max_floor.max()) if n_images else planned_length
+
+    asplanned_counts = np.bincount(asplanned_floors, minlength=length)
+    asbuilt_counts = np.bincount(image_ids * length + asbuilt_floors,
+                                 minlength=n_images * length).reshape(n_images, length)
+    denominator = np.where(asplanned_counts > 0, asplanned_counts, 1)
+
+    # Sequence consideration: any column on a higher floor means every planned floor from 1 up to it is built
+    built = asbuilt_counts > 0
+    built_above = np.zeros_like(built)
+    built_above[:, :-1] = np.logical_or.accumulate(built[:, ::-1], axis=1)[:, ::-1][:, 1:]
+    fill = built_above & (asplanned_counts > 0)
+    fill[:, 0] = False
+    adjusted_asbuilt_counts = np.where(fill, asplanned_counts, asbuilt_counts)
+
+    # Calculate adjusted percentages and the overall progress
+    adjusted_percentages = (adjusted_asbuilt_counts / denominator) * 100
     total_floors = np.sum(asplanned_counts > 0)
-    weighted_progress = np.sum(adjusted_constructed_percentages[1:max_floor] / 100)
-    overall_progress = (weighted_progress / total_floors) * 100 if total_floors > 0 else 0
+    weighted_progress = np.sum(adjusted_percentages[:, 1:] / 100, axis=1)
+    overall_progress = (weighted_progress / total_floors) * 100 if total_floors > 0 else np.zeros(n_images)
 
     return {
         'max_floor': max_floor,
         'asplanned_counts': asplanned_counts,
         'adjusted_asbuilt_counts': adjusted_asbuilt_counts,
-        'adjusted_percentages': adjusted_constructed_percentages,
+        'adjusted_percentages': adjusted_percentages,
         'overall_progress': overall_progress
     }
 
-def main():
-    # Load configuration
-    config = load_config()
-    major_folder = config['major_folder']
-    view = config['view_direction']
+def progress_results(asplanned_data, asbuilt_tables):
+    """process_single_comparison for a list of (N, 5) as-built tables, computed as one batch"""
+    # A file with one row loads as a 1-D array, so reshape before counting rows
+    asplanned_data = np.asarray(asplanned_data).reshape(-1, 5)
+    asbuilt_tables = [np.asarray(table).reshape(-1, 5) for table in asbuilt_tables]
+    sizes = [len(table) for table in asbuilt_tables]
+    asbuilt_floors = np.concatenate([table[:, -1] for table in asbuilt_tables]) if asbuilt_tables else np.zeros(0)
+    batch = batch_progress(asplanned_data[:, -1], asbuilt_floors, np.repeat(np.arange(len(sizes)), sizes), len(sizes))
+
+    results = []
+    for i, max_floor in enumerate(batch['max_floor'].tolist()):
+        results.append({
+            'max_floor': max_floor,
+            'asplanned_counts': batch['asplanned_counts'][:max_floor],
+            'adjusted_asbuilt_counts': batch['adjusted_asbuilt_counts'][i, :max_floor],
+            'adjusted_percentages': batch['adjusted_percentages'][i, :max_floor],
+            'overall_progress': batch['overall_progress'][i]
+        })
+    return results
+
+def process_single_comparison(asplanned_data, asbuilt_data, image_name):
+    return progress_results(asplanned_data, [asbuilt_data])[0]
 
+def get_asplanned_path(config, view):
     # Get as-planned file path
     if view == 'east':
-        asplanned_file_path = get_full_path(major_folder, config['paths']['east_txt_path'])
+        return get_full_path(config['major_folder'], config['paths']['east_txt_path'])
     elif view == 'west':
-        asplanned_file_path = get_full_path(major_folder, config['paths']['west_txt_path'])
+        return get_full_path(config['major_folder'], config['paths']['west_txt_path'])
     elif view == 'north':
-        asplanned_file_path = get_full_path(major_folder, config['paths']['north_txt_path'])
+        return get_full_path(config['major_folder'], config['paths']['north_txt_path'])
     elif view == 'south':
-        asplanned_file_path = get_full_path(major_folder, config['paths']['south_txt_path'])
+        return get_full_path(config['major_folder'], config['paths']['south_txt_path'])
     else:
         raise ValueError(f"Unknown view direction: {view}")
 
-    # Load as-planned data
-    asplanned_data = np.loadtxt(asplanned_file_path, delimiter=',')
+def load_asplanned(config, view):
+    # Load as-planned data, from the typed planned table when the artifact store is enabled
+    artifacts = writer_from_config(config)
+    if artifacts is not None:
+        planned = artifacts.get('planned', view=view)
+        if planned is not None:
+            return field_array(planned, ('xt', 'yt', 'xb', 'yb', 'level'))
+    return np.loadtxt(get_asplanned_path(config, view), delimiter=',')
+
+def load_floor_table(asbuilt_file, image_name, view, artifacts=None):
+    # From the floors table of an ArtifactWriter when it has the image, else from the floor info file
+    floors = artifacts.get('floors', image=image_name, view=view) if artifacts is not None else None
+    if floors is not None:
+        return field_array(floors, ('xt', 'yt', 'xb', 'yb', 'floor'))
+    return np.loadtxt(asbuilt_file, delimiter=',', skiprows=1)
+
+def floor_rows(results):
+    """(floor, planned, constructed, percentage) of every floor with planned columns"""
+    planned = results['asplanned_counts']
+    return [(floor, planned[floor], results['adjusted_asbuilt_counts'][floor], results['adjusted_percentages'][floor])
+            for floor in range(1, results['max_floor']) if planned[floor] > 0]
+
+def save_progress(results, image_name, view, asbuilt_folder, artifacts=None, history=None):
+    """Write and print one image's progress results, and store them with an ArtifactWriter
+    or a ProgressStore"""
+    output_file = os.path.join(asbuilt_folder, f"{view}_{image_name}_construction_percentage.txt")
+    with open(output_file, 'w') as f:
+        f.write(f"Analysis for image: {image_name}\n")
+        f.write("Floor, Constructed Percentage, Constructed Columns, Planned Columns\n")
+        for floor in range(1, results['max_floor']):
+            if results['asplanned_counts'][floor] > 0:
+                f.write(f"{floor}, {results['adjusted_percentages'][floor]:.2f}%, "
+                       f"{results['adjusted_asbuilt_counts'][floor]}, "
+                       f"{results['asplanned_counts'][floor]}\n")
+            else:
+                f.write(f"{floor}, No planned columns\n")
+        f.write(f"\nOverall Project Progress: {results['overall_progress']:.2f}%\n")
+
+    # Print results
+    print(f"\nResults for {image_name}:")
+    print("Floor-by-floor progress:")
+    for floor in range(1, results['max_floor']):
+        if results['asplanned_counts'][floor] > 0:
+            print(f"Floor {floor}: {results['adjusted_percentages'][floor]:.2f}% "
+                  f"({results['adjusted_asbuilt_counts'][floor]}/{results['asplanned_counts'][floor]})")
+    print(f"Overall Progress: {results['overall_progress']:.2f}%")
+    print(f"Results saved to {output_file}")
+
+    if artifacts is not None:
+        artifacts.add_rows('progress', [row + (results['overall_progress'],) for row in floor_rows(results)],
+                           image=image_name, view=view)
+    if history is not None:
+        history.record(view, image_name, results['overall_progress'], floor_rows(results))
+    return output_file
+
+def floor_file_image(asbuilt_file, view):
+    return os.path.basename(asbuilt_file).replace(f"{view}_", "").replace("_floor_info.txt", "")
+
+def process_floor_file(asplanned_data, asbuilt_file, view, asbuilt_folder, artifacts=None, history=None):
+    """Compare one image's floor info file with the as-planned columns and save its progress.
+    With an ArtifactWriter, floors come from its floors table and progress is added to it;
+    with a ProgressStore, progress is also recorded in the history."""
+    image_name = floor_file_image(asbuilt_file, view)
+    print(f"\nProcessing image: {image_name}")
+
+    try:
+        asbuilt_data = load_floor_table(asbuilt_file, image_name, view, artifacts)
+        results = process_single_comparison(asplanned_data, asbuilt_data, image_name)
+        save_progress(results, image_name, view, asbuilt_folder, artifacts, history)
+        return results
+
+    except Exception as e:
+        print(f"Error processing {image_name}: {str(e)}")
+        return None
+
+def process_floor_files(asplanned_data, asbuilt_files, view, asbuilt_folder, artifacts=None, history=None):
+    """process_floor_file for many images: all floor tables are loaded first and their
+    progress is computed in one batch. Returns {image name: results} of the saved images."""
+    names, tables = [], []
+    for asbuilt_file in asbuilt_files:
+        image_name = floor_file_image(asbuilt_file, view)
+        print(f"\nProcessing image: {image_name}")
+        try:
+            table = np.asarray(load_floor_table(asbuilt_file, image_name, view, artifacts)).reshape(-1, 5)
+            if len(table) and table[:, -1].min() < 0:
+                raise ValueError("negative floor label")
+        except Exception as e:
+            print(f"Error processing {image_name}: {str(e)}")
+            continue
+        names.append(image_name)
+        tables.append(table)
+
+    saved = {}
+    for image_name, results in zip(names, progress_results(asplanned_data, tables)):
+        try:
+            save_progress(results, image_name, view, asbuilt_folder, artifacts, history)
+            saved[image_name] = results
+        except Exception as e:
+            print(f"Error processing {image_name}: {str(e)}")
+    return saved
+
+def main():
+    # Load configuration
+    config = load_config()
+    major_folder = config['major_folder']
+    view = config['view_direction']
+
+    asplanned_data = load_asplanned(config, view)
 
     # Get as-built output folder
     asbuilt_folder = get_full_path(major_folder, config['paths']['output_folder_base'])
@@ -82,44 +213,14 @@ def main():
 
     print(f"Found {len(asbuilt_files)} as-built files to analyze")
 
-    # Process each asbuilt file
-    for asbuilt_file in asbuilt_files:
-        image_name = os.path.basename(asbuilt_file).replace(f"{view}_", "").replace("_floor_info.txt", "")
-        print(f"\nProcessing image: {image_name}")
-
-        try:
-            # Load as-built data
-            asbuilt_data = np.loadtxt(asbuilt_file, delimiter=',', skiprows=1)
-
-            # Process comparison
-            results = process_single_comparison(asplanned_data, asbuilt_data, image_name)
-
-            # Save results
-            output_file = os.path.join(asbuilt_folder, f"{view}_{image_name}_construction_percentage.txt")
-            with open(output_file, 'w') as f:
-                f.write(f"Analysis for image: {image_name}\n")
-                f.write("Floor, Constructed Percentage, Constructed Columns, Planned Columns\n")
-                for floor in range(1, results['max_floor']):
-                    if results['asplanned_counts'][floor] > 0:
-                        f.write(f"{floor}, {results['adjusted_percentages'][floor]:.2f}%, "
-                               f"{results['adjusted_asbuilt_counts'][floor]}, "
-                               f"{results['asplanned_counts'][floor]}\n")
-                    else:
-                        f.write(f"{floor}, No planned columns\n")
-                f.write(f"\nOverall Project Progress: {results['overall_progress']:.2f}%\n")
-
-            # Print results
-            print(f"\nResults for {image_name}:")
-            print("Floor-by-floor progress:")
-            for floor in range(1, results['max_floor']):
-                if results['asplanned_counts'][floor] > 0:
-                    print(f"Floor {floor}: {results['adjusted_percentages'][floor]:.2f}% "
-                          f"({results['adjusted_asbuilt_counts'][floor]}/{results['asplanned_counts'][floor]})")
-            print(f"Overall Progress: {results['overall_progress']:.2f}%")
-            print(f"Results saved to {output_file}")
-
-        except Exception as e:
-            print(f"Error processing {image_name}: {str(e)}")
+    # Progress of all asbuilt files in one batch
+    artifacts = writer_from_config(config)
+    history = store_from_config(config)
+    process_floor_files(asplanned_data, asbuilt_files, view, asbuilt_folder, artifacts, history)
+    if artifacts is not None:
+        artifacts.flush()
+    if history is not None:
+        history.close()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
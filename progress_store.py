@@ -0,0 +1,149 @@
+import os
+import sqlite3
+import threading
+from datetime import date, timedelta
+import yaml
+
+def load_config(config_file="user.yaml"):
+    with open(config_file, 'r') as file:
+        config = yaml.safe_load(file)
+    return config
+
+def get_full_path(major_folder, relative_path):
+    return os.path.join(major_folder, relative_path)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS image_progress (
+    survey_date TEXT NOT NULL, view TEXT NOT NULL, image TEXT NOT NULL, overall REAL NOT NULL,
+    recorded_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (survey_date, view, image));
+CREATE TABLE IF NOT EXISTS floor_progress (
+    survey_date TEXT NOT NULL, view TEXT NOT NULL, image TEXT NOT NULL, floor INTEGER NOT NULL,
+    planned INTEGER NOT NULL, constructed INTEGER NOT NULL, percentage REAL NOT NULL,
+    PRIMARY KEY (survey_date, view, image, floor));
+CREATE TABLE IF NOT EXISTS facade_daily (
+    survey_date TEXT NOT NULL, view TEXT NOT NULL, images INTEGER NOT NULL, overall_sum REAL NOT NULL,
+    PRIMARY KEY (survey_date, view));
+CREATE TABLE IF NOT EXISTS floor_daily (
+    survey_date TEXT NOT NULL, view TEXT NOT NULL, floor INTEGER NOT NULL, images INTEGER NOT NULL,
+    planned_sum INTEGER NOT NULL, constructed_sum INTEGER NOT NULL, percentage_sum REAL NOT NULL,
+    PRIMARY KEY (survey_date, view, floor));
+"""
+
+
+class ProgressStore:
+    """Per-floor progress of every image of every survey, kept across runs in one SQLite file.
+
+    image_progress and floor_progress hold the raw rows, keyed by survey date, view and image.
+    facade_daily and floor_daily are rollups per (day, facade) and (day, facade, floor),
+    updated in the same transaction as every insert, so progress curves are read from the
+    rollups without scanning the raw rows. Recording an image again for the same survey
+    replaces its rows and takes its old contribution out of the rollups.
+    """
+
+    def __init__(self, path, survey_date=None):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.survey_date = survey_date
+        self.lock = threading.Lock()
+        # Progress is recorded from worker threads; the lock serializes the connection
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.executescript(SCHEMA)
+
+    def survey(self):
+        """Date that records are filed under: the configured survey date, else today"""
+        return self.survey_date or date.today().isoformat()
+
+    def _add_to_rollups(self, survey_date, view, overall, floor_rows, sign):
+        # Called inside record's transaction; sign -1 takes a replaced image's rows back out
+        self.connection.execute("""INSERT INTO facade_daily VALUES (?, ?, ?, ?)
+                                   ON CONFLICT (survey_date, view) DO UPDATE SET
+                                   images = images + excluded.images, overall_sum = overall_sum + excluded.overall_sum""",
+                                (survey_date, view, sign, sign * overall))
+        self.connection.executemany("""INSERT INTO floor_daily VALUES (?, ?, ?, ?, ?, ?, ?)
+                                       ON CONFLICT (survey_date, view, floor) DO UPDATE SET
+                                       images = images + excluded.images,
+                                       planned_sum = planned_sum + excluded.planned_sum,
+                                       constructed_sum = constructed_sum + excluded.constructed_sum,
+                                       percentage_sum = percentage_sum + excluded.percentage_sum""",
+                                    [(survey_date, view, floor, sign, sign * planned, sign * constructed, sign * percentage)
+                                     for floor, planned, constructed, percentage in floor_rows])
+        if sign < 0:
+            self.connection.execute("DELETE FROM facade_daily WHERE images = 0")
+            self.connection.execute("DELETE FROM floor_daily WHERE images = 0")
+
+    def record(self, view, image, overall, floor_rows, survey_date=None):
+        """Store one image's progress: overall percentage and (floor, planned, constructed, percentage) rows"""
+        survey_date = survey_date or self.survey()
+        key = (survey_date, view, image)
+        floor_rows = [(int(floor), int(planned), int(constructed), float(percentage))
+                      for floor, planned, constructed, percentage in floor_rows]
+        with self.lock, self.connection:
+            previous = self.connection.execute(
+                "SELECT overall FROM image_progress WHERE survey_date = ? AND view = ? AND image = ?", key).fetchone()
+            if previous is not None:
+                previous_rows = self.connection.execute(
+                    "SELECT floor, planned, constructed, percentage FROM floor_progress "
+                    "WHERE survey_date = ? AND view = ? AND image = ?", key).fetchall()
+                self._add_to_rollups(survey_date, view, previous[0], previous_rows, -1)
+                self.connection.execute("DELETE FROM floor_progress WHERE survey_date = ? AND view = ? AND image = ?", key)
+                self.connection.execute("DELETE FROM image_progress WHERE survey_date = ? AND view = ? AND image = ?", key)
+
+            self.connection.execute("INSERT INTO image_progress (survey_date, view, image, overall) VALUES (?, ?, ?, ?)",
+                                    key + (float(overall),))
+            self.connection.executemany("INSERT INTO floor_progress VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                        [key + row for row in floor_rows])
+            self._add_to_rollups(survey_date, view, float(overall), floor_rows, 1)
+
+    def _query(self, sql, args):
+        with self.lock:
+            return self.connection.execute(sql, args).fetchall()
+
+    def progress_curve(self, view=None, since=None, until=None):
+        """[(survey date, images, mean overall progress)] per day, for one facade or all of them"""
+        return self._query("""SELECT survey_date, SUM(images), SUM(overall_sum) / SUM(images) FROM facade_daily
+                              WHERE (? IS NULL OR view = ?) AND (? IS NULL OR survey_date >= ?)
+                              AND (? IS NULL OR survey_date <= ?)
+                              GROUP BY survey_date ORDER BY survey_date""",
+                           (view, view, since, since, until, until))
+
+    def floor_curve(self, view=None, floor=None, since=None, until=None):
+        """[(survey date, floor, images, mean percentage)] per day and floor, for one facade or all of them"""
+        return self._query("""SELECT survey_date, floor, SUM(images), SUM(percentage_sum) / SUM(images) FROM floor_daily
+                              WHERE (? IS NULL OR view = ?) AND (? IS NULL OR floor = ?)
+                              AND (? IS NULL OR survey_date >= ?) AND (? IS NULL OR survey_date <= ?)
+                              GROUP BY survey_date, floor ORDER BY survey_date, floor""",
+                           (view, view, floor, floor, since, since, until, until))
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+
+def store_from_config(config):
+    """ProgressStore of the optional `progress_history` section, or None when it is disabled"""
+    history_config = config.get('progress_history') or {}
+    if not history_config.get('enabled', False):
+        return None
+    path = get_full_path(config['major_folder'], config['paths'].get('progress_store', 'advanced/progress_history.sqlite'))
+    return ProgressStore(path, survey_date=str(history_config.get('survey_date') or '') or None)
+
+def main():
+    # Print the stored progress curve of the last report_days days
+    config = load_config()
+    history_config = config.get('progress_history') or {}
+    path = get_full_path(config['major_folder'], config['paths'].get('progress_store', 'advanced/progress_history.sqlite'))
+    if not os.path.exists(path):
+        print(f"No progress history at {path}")
+        return
+
+    store = ProgressStore(path)
+    since = (date.today() - timedelta(days=history_config.get('report_days', 182))).isoformat()
+    view = config['view_direction'].strip().lower()
+    print(f"Progress of the {view} facade since {since}:")
+    for survey_date, images, overall in store.progress_curve(view, since=since):
+        print(f"{survey_date}: {overall:.2f}% ({images} images)")
+    store.close()
+
+if __name__ == "__main__":
+    main()
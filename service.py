@@ -0,0 +1,179 @@
+import os
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import yaml
+import asplanned
+import asbuilt
+import FloorRec_multi
+import progress_multi
+from detection_table import table_from_config
+from overlay import overlay_settings
+from progress_store import store_from_config
+
+VIEWS = ('east', 'west', 'north', 'south')
+
+def load_config(config_file="user.yaml"):
+    with open(config_file, 'r') as file:
+        config = yaml.safe_load(file)
+    return config
+
+def get_full_path(major_folder, relative_path):
+    return os.path.join(major_folder, relative_path)
+
+class CPMIPService:
+    """Keeps the detector, the as-planned facade tables and the config resident between jobs.
+
+    A job is a list of images taken from one view. Detection runs on one model shared by all
+    jobs, and each detected image flows through coordinates, floor recognition and progress
+    on a worker pool.
+    """
+
+    def __init__(self, config, workers=4):
+        self.config = config
+        self.major_folder = config['major_folder']
+        self.paths = config['paths']
+        self.output_folder_base = get_full_path(self.major_folder, self.paths['output_folder_base'])
+        self.asbuilt_images = get_full_path(self.major_folder, self.paths['asbuilt_images'])
+        self.workers = workers
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self.detect_lock = threading.Lock()   # the model is shared, one batch at a time
+        self.planned_lock = threading.Lock()
+
+        self.detector = asbuilt.create_detector(config)
+        self.detections = table_from_config(config)
+        self.history = store_from_config(config)
+        self.overlay = overlay_settings(config)
+        settings = FloorRec_multi.floor_settings(config)
+        self.thresholds = {key: settings[key] for key in ('distance_threshold', 'tolerance')}
+        self.planned = self.load_planned()
+
+    def load_planned(self):
+        """Extract the IFC columns (through the IFC cache) and build every view's planned table"""
+        column_table, _, transformed = asplanned.load_planned(self.config)
+        print(f"Loaded {len(column_table['ifc_id'])} planned columns")
+        return {view: transformed[view] for view in VIEWS}
+
+    def reload(self):
+        planned = self.load_planned()
+        with self.planned_lock:
+            self.planned = planned
+
+    def resolve_image(self, image):
+        # Bare file names refer to the as-built images folder
+        return image if os.path.isabs(image) else os.path.join(self.asbuilt_images, image)
+
+    def process_image(self, image_path, labels, shape, img, view, planned):
+        name = os.path.splitext(os.path.basename(image_path))[0]
+        output_folder = asbuilt.get_output_folder(self.config, view)
+        asbuilt.convert_image(image_path, labels, shape, img, output_folder, view, detections=self.detections,
+                              overlay=self.overlay)
+
+        floor_file = FloorRec_multi.process_image(image_path, view, self.output_folder_base, detections=self.detections,
+                                                  **self.thresholds)
+        if floor_file is None:
+            return {'image': image_path, 'error': 'floor recognition failed'}
+        results = progress_multi.process_floor_file(planned, floor_file, view, self.output_folder_base,
+                                                    history=self.history)
+        if results is None:
+            return {'image': image_path, 'error': 'progress calculation failed'}
+
+        floors = [{'floor': floor,
+                   'planned': int(results['asplanned_counts'][floor]),
+                   'constructed': int(results['adjusted_asbuilt_counts'][floor]),
+                   'percentage': round(float(results['adjusted_percentages'][floor]), 2)}
+                  for floor in range(1, results['max_floor']) if results['asplanned_counts'][floor] > 0]
+        return {'image': image_path, 'name': name, 'columns': len(labels), 'floors': floors,
+                'overall_progress': round(float(results['overall_progress']), 2)}
+
+    def run_job(self, images, view):
+        """Detect and evaluate a list of images from one view, returns one result per image"""
+        view = str(view).strip().lower()
+        if view not in VIEWS:
+            raise ValueError(f"Invalid view direction: {view}. Use one of: {', '.join(VIEWS)}.")
+        os.makedirs(asbuilt.get_output_folder(self.config, view), exist_ok=True)
+        with self.planned_lock:
+            planned = self.planned[view]
+
+        image_paths = [self.resolve_image(image) for image in images]
+        results = {path: {'image': path, 'error': 'image not found'}
+                   for path in image_paths if not os.path.isfile(path)}
+        found = [path for path in image_paths if path not in results]
+
+        with self.detect_lock:
+            images = self.detector.detect_iter(found, keep_original=self.overlay['mode'] != 'off')
+            jobs = ((image_path, labels, shape, img, view, planned) for image_path, labels, shape, img in images)
+            # Decoded photos stay in memory until processed, so detection waits for the oldest ones
+            for args, future in asbuilt.submit_bounded(self.pool, self.process_image, jobs, 2 * self.workers):
+                try:
+                    results[args[0]] = future.result()
+                except Exception as e:
+                    results[args[0]] = {'image': args[0], 'error': str(e)}
+
+        for image_path in found:
+            if image_path not in results:
+                results[image_path] = {'image': image_path, 'error': 'image could not be decoded'}
+        return [results[path] for path in image_paths]
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    """JSON API: GET /health, POST /jobs {"images": [...], "view": "north"}, POST /reload"""
+
+    service = None
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_json(self):
+        length = int(self.headers.get('Content-Length', 0))
+        return json.loads(self.rfile.read(length) or b'{}')
+
+    def do_GET(self):
+        if self.path == '/health':
+            self.send_json(200, {'status': 'ok', 'views': list(VIEWS)})
+        else:
+            self.send_json(404, {'error': f"Unknown endpoint {self.path}"})
+
+    def do_POST(self):
+        try:
+            if self.path == '/jobs':
+                job = self.read_json()
+                images = job.get('images')
+                if not isinstance(images, list) or not images:
+                    raise ValueError("'images' must be a non-empty list of image paths")
+                view = job.get('view', self.service.config['view_direction'])
+                self.send_json(200, {'view': view, 'results': self.service.run_job(images, view)})
+            elif self.path == '/reload':
+                self.service.reload()
+                self.send_json(200, {'status': 'reloaded'})
+            else:
+                self.send_json(404, {'error': f"Unknown endpoint {self.path}"})
+        except ValueError as e:
+            self.send_json(400, {'error': str(e)})
+        except Exception as e:
+            self.send_json(500, {'error': str(e)})
+
+def main():
+    config = load_config()
+    service_config = config.get('service') or {}
+    host = service_config.get('host', '127.0.0.1')
+    port = service_config.get('port', 8765)
+
+    ServiceHandler.service = CPMIPService(config, workers=service_config.get('workers', 4))
+    server = ThreadingHTTPServer((host, port), ServiceHandler)
+    print(f"CPMIP service listening on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        ServiceHandler.service.pool.shutdown()
+
+if __name__ == "__main__":
+    main()
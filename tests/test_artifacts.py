@@ -0,0 +1,62 @@
+import numpy as np
+from artifacts import ArtifactStore, ArtifactWriter
+
+
+def test_empty_result_is_stored(tmp_path):
+    writer = ArtifactWriter(ArtifactStore(str(tmp_path)))
+    writer.add_rows('detections', np.zeros((0, 4)), image='blank', view='east')
+    writer.add_rows('detections', np.ones((2, 4)), image='busy', view='east')
+    writer.flush()
+
+    reader = ArtifactWriter(ArtifactStore(str(tmp_path)))
+    blank = reader.get('detections', image='blank', view='east')
+    assert blank is not None and len(blank) == 0
+    assert len(reader.get('detections', image='busy', view='east')) == 2
+    assert reader.get('detections', image='unknown', view='east') is None
+
+
+def test_flush_replaces_rows_by_key_and_keeps_table_sorted(tmp_path):
+    store = ArtifactStore(str(tmp_path))
+    writer = ArtifactWriter(store)
+    for image, value in (('img2', 2.0), ('img0', 0.0), ('img1', 1.0)):
+        writer.add_rows('detections', np.full((2, 4), value), image=image, view='east')
+    writer.add_rows('detections', np.full((1, 4), 9.0), image='img0', view='west')
+    writer.flush()
+
+    writer = ArtifactWriter(store)
+    writer.add_rows('detections', np.full((3, 4), 5.0), image='img1', view='east')
+    writer.add_rows('detections', np.full((1, 4), 7.0), image='img3', view='east')
+    writer.flush()
+
+    table = store.load('detections')
+    keys = list(zip(table['image'].tolist(), table['view'].tolist()))
+    assert keys == sorted(keys)
+    assert keys.count(('img1', 'east')) == 3
+    reader = ArtifactWriter(store)
+    assert reader.get('detections', image='img1', view='east')['xt'].tolist() == [5.0] * 3
+    assert reader.get('detections', image='img0', view='east')['xt'].tolist() == [0.0] * 2
+    assert reader.get('detections', image='img0', view='west')['xt'].tolist() == [9.0]
+    assert reader.get('detections', image='img3', view='east')['xt'].tolist() == [7.0]
+    # Lookups are slices of the memory-mapped table, not copies
+    assert isinstance(reader.get('detections', image='img2', view='east'), np.memmap)
+
+
+def test_randomized_flushes_match_a_dict(tmp_path):
+    rng = np.random.default_rng(0)
+    store = ArtifactStore(str(tmp_path))
+    expected = {}
+    for _ in range(20):
+        writer = ArtifactWriter(store)
+        for _ in range(int(rng.integers(1, 6))):
+            key = (f"img{rng.integers(0, 12)}", str(rng.choice(['east', 'west'])))
+            values = rng.random((int(rng.integers(0, 4)), 4))
+            writer.add_rows('detections', values, image=key[0], view=key[1])
+            expected[key] = values
+        writer.flush()
+
+    reader = ArtifactWriter(store)
+    for (image, view), values in expected.items():
+        rows = reader.get('detections', image=image, view=view)
+        np.testing.assert_array_equal(np.column_stack([rows[name] for name in ('xt', 'yt', 'xb', 'yb')]).reshape(-1, 4),
+                                      values)
+    assert len(store.load('detections')) == sum(len(values) for values in expected.values())
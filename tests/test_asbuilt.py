@@ -0,0 +1,28 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from asbuilt import submit_bounded
+
+
+def test_submit_bounded_limits_pending_jobs():
+    taken = []
+    finished = []
+    lock = threading.Lock()
+
+    def jobs():
+        for i in range(20):
+            # Every job taken beyond the limit must wait for an earlier one to finish
+            with lock:
+                assert len(taken) - len(finished) <= 4
+                taken.append(i)
+            yield (i,)
+
+    def work(i):
+        time.sleep(0.005)
+        with lock:
+            finished.append(i)
+        return i * i
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        results = [(args[0], future.result()) for args, future in submit_bounded(pool, work, jobs(), 4)]
+    assert results == [(i, i * i) for i in range(20)]
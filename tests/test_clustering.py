@@ -0,0 +1,42 @@
+import warnings
+import numpy as np
+import pytest
+from clustering import gap_clusters, gap_clusters_batched, gap_eps
+
+
+@pytest.mark.parametrize('x', [[], [412], [87, 87, 87]])
+def test_degenerate_inputs_form_one_cluster(x):
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        eps = gap_eps(x)
+    assert eps > 0
+    assert gap_clusters(np.array(x), eps).tolist() == [0] * len(x)
+
+
+def test_batched_accepts_degenerate_images():
+    xs = [np.array([5, 90, 100]), np.array([7]), np.array([3, 3])]
+    labels = gap_clusters_batched(xs, [gap_eps(x) for x in xs])
+    assert [l.tolist() for l in labels] == [[0, 1, 1], [0], [0, 0]]
+
+
+def test_splits_at_gaps_wider_than_eps():
+    x = np.array([300, 10, 12, 305, 150])
+    assert gap_clusters(x, gap_eps(x)).tolist() == [0, 1, 1, 0, 2]
+
+
+def test_matches_dbscan_on_random_inputs():
+    DBSCAN = pytest.importorskip('sklearn.cluster').DBSCAN
+    rng = np.random.default_rng(0)
+    for _ in range(500):
+        n = int(rng.integers(1, 60))
+        # Integer pixel coordinates, so gaps equal to eps and repeated x values both occur
+        x = rng.integers(0, int(rng.choice([20, 400, 3000])), n).astype(np.float64)
+        eps = gap_eps(x)
+        expected = DBSCAN(eps=eps, min_samples=1).fit_predict(x.reshape(-1, 1))
+        assert gap_clusters(x, eps).tolist() == expected.tolist()
+        # An eps exactly on a gap: DBSCAN links points at distance <= eps
+        gaps = np.diff(np.unique(x))
+        if len(gaps):
+            eps = float(rng.choice(gaps))
+            expected = DBSCAN(eps=eps, min_samples=1).fit_predict(x.reshape(-1, 1))
+            assert gap_clusters(x, eps).tolist() == expected.tolist()
@@ -0,0 +1,44 @@
+import os
+import numpy as np
+from detection_cache import DetectionCache
+
+
+def labels(i):
+    return np.full((3, 5), float(i))
+
+
+def entry_bytes(tmp_path):
+    probe = DetectionCache(str(tmp_path / 'probe'))
+    probe.put('probe', labels(0), (600, 800))
+    return os.path.getsize(probe.path('probe'))
+
+
+def test_evicts_least_recently_used_under_max_bytes(tmp_path):
+    size = entry_bytes(tmp_path)
+    cache = DetectionCache(str(tmp_path / 'cache'), max_bytes=3 * size, memory_entries=0)
+    for key in ('a', 'b', 'c'):
+        cache.put(key, labels(ord(key)), (600, 800))
+    assert cache.get('a')[1] == (600, 800)   # a is now the most recently used
+
+    cache.put('d', labels(4), (600, 800))
+    assert cache.get('b') is None
+    assert not os.path.exists(cache.path('b'))
+    assert sorted(cache.files) == ['a', 'c', 'd']
+    assert cache.total_bytes <= cache.max_bytes
+    np.testing.assert_array_equal(cache.get('a')[0], labels(ord('a')))
+
+
+def test_lru_order_survives_a_restart(tmp_path):
+    size = entry_bytes(tmp_path)
+    folder = str(tmp_path / 'cache')
+    cache = DetectionCache(folder, max_bytes=3 * size)
+    for key in ('a', 'b', 'c'):
+        cache.put(key, labels(ord(key)), (600, 800))
+    # Last use is recorded in the file mtime; make the order explicit: b oldest, then c, then a
+    for age, key in ((30, 'b'), (20, 'c'), (10, 'a')):
+        stamp = os.stat(cache.path(key)).st_mtime - age
+        os.utime(cache.path(key), (stamp, stamp))
+
+    reopened = DetectionCache(folder, max_bytes=3 * size)
+    reopened.put('d', labels(4), (600, 800))
+    assert sorted(os.path.splitext(name)[0] for name in os.listdir(folder)) == ['a', 'c', 'd']
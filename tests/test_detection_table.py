@@ -0,0 +1,49 @@
+import numpy as np
+from detection_table import ROW_BYTES, DetectionTable
+
+
+def test_torn_tail_is_dropped_on_reopen(tmp_path):
+    path = str(tmp_path / 'detections')
+    table = DetectionTable(path)
+    table.append('img0', 'east', np.ones((2, 4)))
+    table.append('img1', 'east', np.full((3, 4), 2.0))
+    table.close()
+
+    # A crash after the rows of img2 but before its whole index line
+    with open(path + '.bin', 'ab') as f:
+        f.write(np.zeros((4, 4)).tobytes())
+    with open(path + '.idx', 'ab') as f:
+        f.write(b'["east", "img2", 5, 4')
+
+    table = DetectionTable(path)
+    assert ('east', 'img2') not in table
+    assert table.get('img1', 'east').tolist() == [[2.0] * 4] * 3
+
+    # The next append overwrites the torn tail
+    table.append('img3', 'east', np.full((1, 4), 3.0))
+    table.close()
+    reopened = DetectionTable(path)
+    assert reopened.get('img3', 'east').tolist() == [[3.0] * 4]
+    assert sorted(image for _, image in reopened.index) == ['img0', 'img1', 'img3']
+    assert (tmp_path / 'detections.bin').stat().st_size == 6 * ROW_BYTES
+
+
+def test_compact_drops_superseded_rows(tmp_path):
+    path = str(tmp_path / 'detections')
+    table = DetectionTable(path)
+    for i in range(3):
+        table.append(f'img{i}', 'east', np.full((2, 4), float(i)))
+    table.append('img0', 'east', np.full((1, 4), 10.0))
+    table.append('img1', 'east', np.zeros((0, 4)))
+    assert table.superseded_fraction() == 4 / 7
+    assert not table.maybe_compact(0.6)
+    assert table.maybe_compact(0.5)
+
+    assert table.superseded_fraction() == 0.0
+    assert (tmp_path / 'detections.bin').stat().st_size == 3 * ROW_BYTES
+    for reader in (table, DetectionTable(path)):
+        assert reader.get('img0', 'east').tolist() == [[10.0] * 4]
+        assert reader.get('img1', 'east').shape == (0, 4)
+        assert reader.get('img2', 'east').tolist() == [[2.0] * 4] * 2
+    table.append('img4', 'east', np.ones((1, 4)))
+    assert DetectionTable(path).get('img4', 'east').tolist() == [[1.0] * 4]
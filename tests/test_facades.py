@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+from asplanned import planned_facades, save_to_file
+from facades import VIEWS, select_facades, to_elevation
+
+
+def reference_facades(mixed_list):
+    """The per-view loops select_facades and to_elevation replaced, kept as the reference"""
+    rounded = [[round(num, 2) for num in column] for column in mixed_list]
+    outliers = {
+        'east': [c for c in rounded if c[0] == max(col[0] for col in rounded)],
+        'west': [c for c in rounded if c[0] == min(col[0] for col in rounded)],
+        'north': [c for c in rounded if c[1] == max(col[1] for col in rounded)],
+        'south': [c for c in rounded if c[1] == min(col[1] for col in rounded)],
+    }
+    w_ymax = max(col[1] for col in outliers['west'])
+    n_xmax = max(col[0] for col in outliers['north'])
+    horizontal = {'east': lambda x, y: y, 'west': lambda x, y: w_ymax - y,
+                  'north': lambda x, y: n_xmax - x, 'south': lambda x, y: x}
+    return {view: [[horizontal[view](x, y), zt, horizontal[view](x, y), zb, level]
+                   for x, y, zt, zb, level in outliers[view]] for view in VIEWS}
+
+
+def random_columns(rng):
+    # Columns on a grid with jitter below the rounding, so facades share an exact coordinate
+    n = int(rng.integers(1, 60))
+    grid = rng.integers(0, 6, (n, 2)) * rng.uniform(3.0, 9.0) + rng.uniform(-50, 50, 2)
+    xy = grid + rng.uniform(-0.004, 0.004, (n, 2))
+    level = rng.integers(0, 8, n)
+    zbot = level * 3.2 + rng.uniform(-0.01, 0.01, n)
+    return [[float(x), float(y), float(zb + 3.0), float(zb), int(l)] for (x, y), zb, l in zip(xy, zbot, level)]
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_facade_files_match_the_reference_loops(tmp_path, seed):
+    rng = np.random.default_rng(seed)
+    for i in range(200):
+        mixed_list = random_columns(rng)
+        expected = reference_facades(mixed_list)
+        planned = planned_facades(np.array(mixed_list, dtype=np.float64))
+        for view in VIEWS:
+            new_file, old_file = tmp_path / f"{view}_new.txt", tmp_path / f"{view}_old.txt"
+            save_to_file(new_file, planned[view])
+            old_file.write_text(''.join(', '.join(map(str, entry)) + '\n' for entry in expected[view]))
+            assert new_file.read_bytes() == old_file.read_bytes(), (seed, i, view)
+
+
+def test_select_facades_matches_exact_extremes():
+    rng = np.random.default_rng(7)
+    columns = np.column_stack([rng.integers(0, 5, (50, 2)).astype(float), rng.random((50, 3))])
+    masks = select_facades(columns)
+    np.testing.assert_array_equal(masks['east'], columns[:, 0] == columns[:, 0].max())
+    np.testing.assert_array_equal(masks['west'], columns[:, 0] == columns[:, 0].min())
+    np.testing.assert_array_equal(masks['north'], columns[:, 1] == columns[:, 1].max())
+    np.testing.assert_array_equal(masks['south'], columns[:, 1] == columns[:, 1].min())
+    assert to_elevation(columns[:0], 'west').shape == (0, 5)
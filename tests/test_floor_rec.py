@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+from FloorRec_multi import DISTANCE_THRESHOLD, FLOOR_TOLERANCE, assign_floors
+
+
+def reference_assign_floors(column_data, clusters, avg_height, tolerance=FLOOR_TOLERANCE,
+                            distance_threshold=DISTANCE_THRESHOLD):
+    """The per-cluster loop assign_floors replaced, kept as the reference for its results"""
+    cluster_dict = {}
+    for i, cluster_id in enumerate(clusters):
+        if cluster_id != -1:
+            cluster_dict.setdefault(cluster_id, []).append(list(column_data[i]))
+
+    avg_lowest_y = np.mean([min(col[3] for col in columns) for columns in cluster_dict.values()])
+    all_floors_info = []
+    scaled_distances = []
+    for columns in cluster_dict.values():
+        lowest_col = min(columns, key=lambda col: col[3])
+        scaled_distance = (lowest_col[3] - avg_lowest_y) / (lowest_col[1] - lowest_col[3])
+        scaled_distances.append(scaled_distance)
+
+        columns.sort(key=lambda col: col[3], reverse=True)
+        floor_number = 1 if scaled_distance <= distance_threshold else 2
+        column_floor_info = []
+        prev_y = columns[-1][3]
+        for idx, (xt, yt, xb, yb) in enumerate(reversed(columns)):
+            if idx > 0:
+                vertical_distance = yb - prev_y
+                if vertical_distance > 2 * avg_height * tolerance:
+                    floor_number += 3
+                elif vertical_distance > avg_height * tolerance:
+                    floor_number += 2
+                else:
+                    floor_number += 1
+            column_floor_info.append((xt, yt, xb, yb, floor_number))
+            prev_y = yb
+        column_floor_info.reverse()
+        all_floors_info.extend(column_floor_info)
+    return np.array(all_floors_info, dtype=np.int64).reshape(-1, 5), list(cluster_dict), scaled_distances
+
+
+def random_layout(rng):
+    n = int(rng.integers(1, 40))
+    yb = rng.integers(0, 60, n) * int(rng.choice([1, 25]))    # coarse values give ties
+    height = rng.integers(20, 120, n)
+    xb = rng.integers(0, 2000, n)
+    column_data = np.column_stack([xb + rng.integers(-5, 6, n), yb + height, xb, yb])
+    clusters = rng.integers(-1 if rng.random() < 0.3 else 0, int(rng.integers(1, 6)), n)
+    if np.all(clusters == -1):
+        clusters[0] = 0
+    return column_data, clusters, float(height.mean())
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_assign_floors_matches_reference(seed):
+    rng = np.random.default_rng(seed)
+    for _ in range(1000):
+        column_data, clusters, avg_height = random_layout(rng)
+        tolerance = float(rng.choice([FLOOR_TOLERANCE, 0.5, 1.0]))
+        rows, row_clusters, cluster_ids, scaled_distances = assign_floors(column_data, clusters, avg_height, tolerance)
+        expected_rows, expected_ids, expected_distances = reference_assign_floors(column_data, clusters, avg_height,
+                                                                                  tolerance)
+        np.testing.assert_array_equal(rows, expected_rows)
+        assert cluster_ids.tolist() == expected_ids
+        np.testing.assert_allclose(scaled_distances, expected_distances)
+        assert len(row_clusters) == len(rows)
+
+
+def test_single_column_starts_at_floor_one():
+    rows, _, cluster_ids, _ = assign_floors(np.array([[105, 400, 100, 250]]), np.array([0]), 150.0)
+    assert rows.tolist() == [[105, 400, 100, 250, 1]]
+    assert cluster_ids.tolist() == [0]
+
+
+@pytest.mark.parametrize('coordinates', [[[105, 400, 100, 250]], [[105, 400, 100, 250], [104, 530, 100, 380]]])
+def test_recognize_image_with_one_column_line(tmp_path, coordinates):
+    pytest.importorskip('matplotlib')
+    import struct
+    from FloorRec_multi import recognize_image
+    from image_meta import PNG_SIGNATURE
+
+    image_path = tmp_path / 'img.png'
+    image_path.write_bytes(PNG_SIGNATURE + struct.pack('>I4sII5B', 13, b'IHDR', 800, 600, 8, 2, 0, 0, 0) + b'\0' * 4)
+    (tmp_path / 'east_output').mkdir()
+    np.savetxt(tmp_path / 'east_output' / 'img.txt', np.array(coordinates), delimiter=', ', fmt='%d')
+
+    result = recognize_image(str(image_path), 'east', str(tmp_path))
+    assert result['status'] == 'ok', result['error']
+    assert sorted(result['rows'][:, 4].tolist()) == list(range(1, len(coordinates) + 1))
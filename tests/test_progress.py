@@ -0,0 +1,28 @@
+import numpy as np
+from progress_multi import process_single_comparison, progress_results
+
+PLANNED = np.array([[0, 0, 0, 0, floor] for floor in (1, 1, 2, 2, 3, 3)], dtype=np.float64)
+
+
+def test_one_row_floor_file(tmp_path):
+    # np.loadtxt gives a 1-D array for a floor file with a single column
+    floor_file = tmp_path / 'east_img_floor_info.txt'
+    floor_file.write_text("Xtop, Ytop, Xbot, Ybot, Floor\n105, 400, 100, 250, 2\n")
+    asbuilt = np.loadtxt(floor_file, delimiter=',', skiprows=1)
+    assert asbuilt.shape == (5,)
+
+    results = process_single_comparison(PLANNED, asbuilt, 'img')
+    assert results['max_floor'] == 4
+    assert results['adjusted_asbuilt_counts'].tolist() == [0, 2, 1, 0]
+    assert results['adjusted_percentages'].tolist() == [0, 100, 50, 0]
+    assert results['overall_progress'] == 50
+
+
+def test_batch_matches_single_images():
+    tables = [np.array([[0, 0, 0, 0, 1], [0, 0, 0, 0, 3]]), np.array([0, 0, 0, 0, 1]), np.zeros((0, 5))]
+    batch = progress_results(PLANNED, tables)
+    for table, results in zip(tables, batch):
+        single = process_single_comparison(PLANNED, table, 'img')
+        assert results['max_floor'] == single['max_floor']
+        np.testing.assert_array_equal(results['adjusted_asbuilt_counts'], single['adjusted_asbuilt_counts'])
+        assert results['overall_progress'] == single['overall_progress']
@@ -0,0 +1,37 @@
+import pytest
+from progress_store import ProgressStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ProgressStore(str(tmp_path / 'history.sqlite'), survey_date='2024-05-01')
+    yield store
+    store.close()
+
+
+def test_rerecording_an_image_replaces_its_rollup_contribution(store):
+    store.record('east', 'img0', 40.0, [(1, 4, 4, 100.0), (2, 4, 0, 0.0)])
+    store.record('east', 'img1', 60.0, [(1, 4, 4, 100.0), (2, 4, 2, 50.0)])
+    assert store.progress_curve('east') == [('2024-05-01', 2, 50.0)]
+
+    store.record('east', 'img0', 80.0, [(1, 4, 4, 100.0), (2, 4, 3, 75.0), (3, 2, 1, 50.0)])
+    assert store.progress_curve('east') == [('2024-05-01', 2, 70.0)]
+    assert store.floor_curve('east') == [('2024-05-01', 1, 2, 100.0), ('2024-05-01', 2, 2, 62.5),
+                                         ('2024-05-01', 3, 1, 50.0)]
+
+    # A floor the new record no longer has leaves the rollups entirely
+    store.record('east', 'img0', 10.0, [(1, 4, 1, 25.0)])
+    assert store.floor_curve('east', floor=3) == []
+    assert store.floor_curve('east', floor=2) == [('2024-05-01', 2, 1, 50.0)]
+
+
+def test_rollups_match_the_raw_rows(store):
+    store.record('east', 'img0', 30.0, [(1, 4, 2, 50.0)], survey_date='2024-04-01')
+    store.record('west', 'img0', 90.0, [(1, 4, 4, 100.0)], survey_date='2024-04-01')
+    store.record('east', 'img0', 50.0, [(1, 4, 4, 100.0)])
+    store.record('east', 'img0', 70.0, [(1, 4, 3, 75.0)])
+    assert store.progress_curve() == [('2024-04-01', 2, 60.0), ('2024-05-01', 1, 70.0)]
+    assert store.progress_curve('east', since='2024-04-15') == [('2024-05-01', 1, 70.0)]
+    raw = store.connection.execute("SELECT survey_date, COUNT(*), AVG(overall) FROM image_progress "
+                                   "GROUP BY survey_date ORDER BY survey_date").fetchall()
+    assert raw == store.progress_curve()
@@ -0,0 +1,56 @@
+import logging
+import threading
+import time
+from cpmip import TaskGraph
+
+logger = logging.getLogger('test_task_graph')
+
+
+def test_dependents_of_a_failed_task_are_skipped():
+    ran = []
+    graph = TaskGraph(2, logger)
+
+    def fail():
+        raise RuntimeError("boom")
+
+    graph.add('ok', lambda: ran.append('ok') or 1)
+    graph.add('bad', fail)
+    graph.add('child', lambda: ran.append('child'), ['bad'])
+    graph.add('grandchild', lambda: ran.append('grandchild'), ['child'])
+    graph.add('sibling', lambda: ran.append('sibling') or graph.result('ok') + 1, ['ok'])
+    assert graph.wait() is False
+
+    assert sorted(ran) == ['ok', 'sibling']
+    assert graph.failed == {'bad', 'child', 'grandchild'}
+    assert graph.result('sibling') == 2
+
+
+def test_task_added_after_its_dependency_failed_is_skipped():
+    graph = TaskGraph(1, logger)
+
+    def fail():
+        raise ValueError("boom")
+
+    graph.add('bad', fail)
+    # Let the failure be recorded before the late task is added
+    while 'bad' not in graph.failed:
+        time.sleep(0.001)
+    graph.add('late', lambda: None, ['bad'])
+    assert graph.wait() is False
+    assert 'late' in graph.failed
+
+
+def test_dedicated_task_can_wait_on_pool_work():
+    # With one pool worker, a task blocking on work it schedules must not hold that worker
+    graph = TaskGraph(1, logger)
+    released = threading.Semaphore(0)
+
+    def producer():
+        for i in range(3):
+            graph.add(f"item{i}", released.release)
+            released.acquire()
+        return 'done'
+
+    graph.add('producer', producer, dedicated=True)
+    assert graph.wait() is True
+    assert graph.result('producer') == 'done'
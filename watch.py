@@ -0,0 +1,222 @@
+import os
+import time
+import queue
+import threading
+import yaml
+import asbuilt
+from manifest import RunManifest
+from detection_table import compact_from_config
+from service import CPMIPService
+
+# Defaults for the optional `watch` section of user.yaml
+WATCH_DEFAULTS = {'poll_seconds': 1.0, 'settle_seconds': 2.0, 'queue_size': 16, 'batch_size': 4,
+                  'retry_seconds': 30.0, 'retry_max_seconds': 1800.0}
+
+def load_config(config_file="user.yaml"):
+    with open(config_file, 'r') as file:
+        config = yaml.safe_load(file)
+    return config
+
+def get_full_path(major_folder, relative_path):
+    return os.path.join(major_folder, relative_path)
+
+def watch_settings(config):
+    return dict(WATCH_DEFAULTS, **(config.get('watch') or {}))
+
+class FolderWatcher:
+    """Polls a folder for images and reports each one once it has stopped changing.
+
+    An upload is complete when a file's size and mtime stayed the same for settle_seconds,
+    so photos still being copied are never picked up half written.
+    """
+
+    def __init__(self, folder, settle_seconds=2.0):
+        self.folder = folder
+        self.settle_seconds = settle_seconds
+        self.seen = {}   # path -> (size, mtime_ns), monotonic time that state was first seen
+
+    def poll(self):
+        """[(image path, (size, mtime_ns))] of the settled images, sorted by path"""
+        now = time.monotonic()
+        current = {}
+        ready = []
+        for entry in os.scandir(self.folder):
+            if not entry.is_file() or not entry.name.lower().endswith(asbuilt.IMAGE_EXTENSIONS):
+                continue
+            st = entry.stat()
+            stamp = (st.st_size, st.st_mtime_ns)
+            previous = self.seen.get(entry.path)
+            since = previous[1] if previous is not None and previous[0] == stamp else now
+            current[entry.path] = (stamp, since)
+            if now - since >= self.settle_seconds:
+                ready.append((entry.path, stamp))
+        self.seen = current
+        return sorted(ready)
+
+class StreamProcessor:
+    """Streams settled photos through detection, conversion, floor recognition and progress.
+
+    A watcher thread puts new photos on a bounded queue and blocks while it is full, so
+    uploads faster than the model wait on disk rather than in memory. One worker takes up
+    to batch_size queued photos at a time and runs them as a service job. Photos whose bytes
+    are recorded in the watch manifest with existing results are never processed again. A
+    failed photo is retried after retry_seconds, doubling with every further failure up to
+    retry_max_seconds, or as soon as its file changes.
+    """
+
+    def __init__(self, config, service, view, folder, manifest, settings):
+        self.config = config
+        self.service = service
+        self.view = view
+        # Absolute, since the service resolves relative names against the as-built images folder
+        self.folder = os.path.abspath(folder)
+        self.manifest = manifest
+        self.settings = settings
+        self.output_folder_base = get_full_path(config['major_folder'], config['paths']['output_folder_base'])
+        self.jobs = queue.Queue(maxsize=settings['queue_size'])
+        self.stop = threading.Event()
+        self.lock = threading.Lock()
+        self.queued = set()
+        self.done = {}     # path -> stamp of the processed file
+        self.failed = {}   # path -> (stamp of the file that failed, failures, monotonic time of the next try)
+        self.names = {}    # result name (file stem) -> path of the photo whose results carry it
+
+    def manifest_key(self, image_path):
+        # The file name, so IMG_1.jpg and IMG_1.png are tracked separately
+        return f"{self.view}/{os.path.basename(image_path)}"
+
+    def retry_delay(self, failures):
+        return min(self.settings['retry_seconds'] * 2 ** (failures - 1), self.settings['retry_max_seconds'])
+
+    def is_processed(self, image_path, stamp):
+        with self.lock:
+            if image_path in self.queued or self.done.get(image_path) == stamp:
+                return True
+            failed = self.failed.get(image_path)
+            if failed is not None and failed[0] == stamp and time.monotonic() < failed[2]:
+                return True
+        inputs = {'image': self.manifest.file_hash(image_path)}
+        if self.manifest.is_fresh('watch', self.manifest_key(image_path), inputs):
+            with self.lock:
+                self.done[image_path] = stamp
+            return True
+        return False
+
+    def enqueue(self, image_path, stamp):
+        with self.lock:
+            self.queued.add(image_path)
+        # Backpressure: wait for room, but keep checking for shutdown
+        while not self.stop.is_set():
+            try:
+                self.jobs.put((image_path, stamp, time.monotonic()), timeout=self.settings['poll_seconds'])
+                return
+            except queue.Full:
+                continue
+
+    def watch(self):
+        watcher = FolderWatcher(self.folder, self.settings['settle_seconds'])
+        print(f"Watching {self.folder} for {self.view} photos")
+        while not self.stop.is_set():
+            for image_path, stamp in watcher.poll():
+                if self.stop.is_set():
+                    break
+                try:
+                    if not self.is_processed(image_path, stamp):
+                        self.enqueue(image_path, stamp)
+                except OSError:
+                    # Removed or replaced between the scan and the hash; the next poll sees it again
+                    continue
+            self.stop.wait(self.settings['poll_seconds'])
+
+    def next_batch(self):
+        """Up to batch_size queued photos, waiting for the first; None after shutdown"""
+        batch = []
+        while not batch:
+            try:
+                batch.append(self.jobs.get(timeout=self.settings['poll_seconds']))
+            except queue.Empty:
+                if self.stop.is_set():
+                    return None
+        while len(batch) < self.settings['batch_size']:
+            try:
+                batch.append(self.jobs.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def process(self):
+        while True:
+            batch = self.next_batch()
+            if batch is None:
+                return
+            try:
+                results = self.service.run_job([image_path for image_path, _, _ in batch], self.view)
+            except Exception as e:
+                results = [{'error': str(e)}] * len(batch)
+
+            for (image_path, stamp, queued_at), result in zip(batch, results):
+                name = os.path.splitext(os.path.basename(image_path))[0]
+                elapsed = time.monotonic() - queued_at
+                if 'error' in result:
+                    with self.lock:
+                        previous = self.failed.get(image_path)
+                        failures = previous[1] + 1 if previous is not None and previous[0] == stamp else 1
+                        delay = self.retry_delay(failures)
+                        self.failed[image_path] = (stamp, failures, time.monotonic() + delay)
+                    print(f"Error processing {name}: {result['error']} (retrying in {delay:.0f}s)")
+                else:
+                    with self.lock:
+                        other = self.names.setdefault(name, image_path)
+                        self.names[name] = image_path
+                    if other != image_path:
+                        # Result files are named by stem across the pipeline
+                        print(f"Warning: {os.path.basename(image_path)} overwrote the results of "
+                              f"{os.path.basename(other)}, which has the same name")
+                    percentage_file = os.path.join(self.output_folder_base,
+                                                   f"{self.view}_{name}_construction_percentage.txt")
+                    try:
+                        self.manifest.record('watch', self.manifest_key(image_path),
+                                             {'image': self.manifest.file_hash(image_path)}, [percentage_file])
+                    except OSError:
+                        pass
+                    print(f"{name}: overall progress {result['overall_progress']:.2f}% ({elapsed:.1f}s after it was queued)")
+                    with self.lock:
+                        self.done[image_path] = stamp
+                        self.failed.pop(image_path, None)
+                with self.lock:
+                    self.queued.discard(image_path)
+            self.manifest.save()
+
+    def run(self):
+        worker = threading.Thread(target=self.process, name='cpmip-watch-worker', daemon=True)
+        worker.start()
+        try:
+            self.watch()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            # Photos already queued are finished; anything still on disk is picked up next time
+            self.stop.set()
+            worker.join()
+            self.manifest.save()
+
+def main():
+    config = load_config()
+    settings = watch_settings(config)
+    paths = config['paths']
+    view = asbuilt.get_view_direction(config)
+    folder = get_full_path(config['major_folder'], paths['asbuilt_images'])
+    manifest = RunManifest(get_full_path(config['major_folder'], paths.get('watch_manifest', 'advanced/watch_manifest.json')))
+
+    service_config = config.get('service') or {}
+    service = CPMIPService(config, workers=service_config.get('workers', 4))
+    try:
+        StreamProcessor(config, service, view, folder, manifest, settings).run()
+    finally:
+        service.pool.shutdown()
+        if service.history is not None:
+            service.history.close()
+        compact_from_config(service.detections, config)
+
+if __name__ == "__main__":
+    main()